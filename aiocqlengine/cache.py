@@ -0,0 +1,130 @@
+"""
+Read-through caching of rows looked up by full primary key.
+"""
+import time
+from collections import OrderedDict
+from functools import partial
+
+from aiocqlengine.session import SingleFlight
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 60.0
+
+
+class CacheBackend(object):
+    """
+    Storage behind a :class:`ModelCache`.
+
+    Keys are tuples of the table name and the primary key values, values
+    are the raw rows returned by the driver. ``get`` returns None for a
+    missing or expired key.
+    """
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process backend, keeps the ``maxsize`` most recently used rows
+    for up to their ttl.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._rows = OrderedDict()
+
+    def __len__(self):
+        return len(self._rows)
+
+    async def get(self, key):
+        entry = self._rows.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._rows[key]
+            return None
+        self._rows.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self._rows[key] = (time.monotonic() + ttl, value)
+        self._rows.move_to_end(key)
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+    async def delete(self, key):
+        self._rows.pop(key, None)
+
+    async def clear(self):
+        self._rows.clear()
+
+
+class ModelCache(object):
+    """
+    Read-through cache of a model's rows, enabled by setting it as the
+    model's ``__cache__``:
+
+    .. code-block:: python
+
+        class User(AioModel):
+            __cache__ = ModelCache(ttl=30)
+
+    ``async_get`` and ``async_first`` on a full primary key are served
+    from the cache, concurrent misses on the same key share a single
+    read. ``async_save``, ``async_update`` and ``async_delete`` of an
+    instance invalidate its key, a queryset ``async_update`` invalidates
+    its key or clears the cache. Writes made any other way, or by other
+    processes, are only seen once the cached row expires.
+    """
+
+    def __init__(self, backend=None, ttl=DEFAULT_CACHE_TTL,
+                 maxsize=DEFAULT_CACHE_SIZE):
+        self.backend = backend if backend is not None else LRUCache(maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._loading = SingleFlight()
+
+    async def get(self, key, load):
+        """
+        Returns the cached row for ``key``, or the row returned by
+        awaiting ``load()``, which is then cached unless it is None.
+        """
+        row = await self.backend.get(key)
+        if row is not None:
+            self.hits += 1
+            return row
+
+        if key in self._loading:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return await self._loading.run(key, partial(self._load, key, load))
+
+    async def _load(self, key, load):
+        row = await load()
+        # a write invalidating the key while it was being read forgets
+        # this read, the row may be stale then
+        if row is not None and self._loading.is_current(key):
+            await self.backend.set(key, row, self.ttl)
+        return row
+
+    async def invalidate(self, key):
+        self._loading.forget(key)
+        await self.backend.delete(key)
+
+    async def clear(self):
+        self._loading.forget()
+        await self.backend.clear()
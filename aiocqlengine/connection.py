@@ -0,0 +1,74 @@
+"""
+Driver connections that do their I/O on the application's event loop.
+"""
+import asyncio
+import sys
+import threading
+
+from cassandra.connection import Connection
+from cassandra.io.asyncioreactor import AsyncioConnection
+
+
+def _loop_kwargs(loop):
+    # asyncio primitives lost their loop argument in 3.10, and no longer
+    # bind to a loop on creation
+    return {} if sys.version_info >= (3, 10) else {"loop": loop}
+
+
+class AioLoopConnection(AsyncioConnection):
+    """
+    :class:`~cassandra.io.asyncioreactor.AsyncioConnection` reading and
+    writing on the application's event loop, instead of on a loop of
+    its own running in a separate thread.
+
+    Responses are decoded and handed to the session's callbacks on the
+    loop thread, so no result has to cross threads to reach the awaiting
+    coroutine. Use :func:`loop_connection_class` to get a class bound to
+    a loop, or :func:`~aiocqlengine.session.connect_aiosession` which
+    sets it up.
+
+    Blocking driver calls (``session.execute``, ``session.prepare``,
+    ``cluster.connect``, the synchronous cqlengine API) wait for a
+    response that only the loop can read, and must never be made from
+    the loop thread while this class is in use.
+    """
+
+    _loop = None
+    _loop_thread = None
+
+    def __init__(self, *args, **kwargs):
+        # Same as AsyncioConnection.__init__, with the asyncio primitives
+        # bound to the application loop, whatever thread this runs in
+        Connection.__init__(self, *args, **kwargs)
+
+        self._connect_socket()
+        self._socket.setblocking(0)
+
+        self._write_queue = asyncio.Queue(**_loop_kwargs(self._loop))
+        self._write_queue_lock = asyncio.Lock(**_loop_kwargs(self._loop))
+
+        self._read_watcher = asyncio.run_coroutine_threadsafe(
+            self.handle_read(), loop=self._loop)
+        self._write_watcher = asyncio.run_coroutine_threadsafe(
+            self.handle_write(), loop=self._loop)
+        self._send_options_message()
+
+    @classmethod
+    def initialize_reactor(cls):
+        if cls._loop is None:
+            raise RuntimeError(
+                "AioLoopConnection is not bound to an event loop, "
+                "use loop_connection_class()")
+
+
+def loop_connection_class(loop, thread=None):
+    """
+    Returns an :class:`AioLoopConnection` subclass doing its I/O on
+    ``loop``, which runs in ``thread`` (the current thread by default),
+    to pass as ``Cluster(connection_class=...)``.
+    """
+    return type(
+        "AioLoopConnection", (AioLoopConnection, ), {
+            "_loop": loop,
+            "_loop_thread": thread or threading.current_thread(),
+        })
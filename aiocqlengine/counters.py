@@ -0,0 +1,81 @@
+"""
+Coalescing of counter increments.
+"""
+import asyncio
+from collections import OrderedDict
+from functools import partial
+
+from aiocqlengine.session import SingleFlight
+
+
+class IncrementCoalescer(object):
+    """
+    Merges the ``async_incr`` calls made on the same row within
+    ``window`` seconds into a single update, enabled by setting it as the
+    model's ``__counter_coalescer__``:
+
+    .. code-block:: python
+
+        class PageViews(AioModel):
+            __counter_coalescer__ = IncrementCoalescer(window=0.005)
+
+    Every call returns once the update carrying its delta has been
+    applied, or raises its error. A cancelled call's delta is still
+    written with the others.
+    """
+
+    def __init__(self, window=0.005):
+        self.window = window
+        self.increments = 0
+        self.writes = 0
+        self._pending = OrderedDict()
+        self._updates = SingleFlight()
+        self._window = None
+        self._handle = None
+        self._writing = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, key, deltas, write):
+        """
+        Adds ``deltas`` to the pending update of ``key``, which is sent
+        by awaiting ``write(deltas)`` once the window has passed
+        """
+        self.increments += 1
+        merged = self._pending.setdefault(key, {})
+        for name, delta in deltas.items():
+            merged[name] = merged.get(name, 0) + delta
+        await self._updates.run(key, partial(self._write, key, write))
+
+    async def flush(self):
+        """
+        Sends the pending updates now and waits for them
+        """
+        # let the updates of the calls just made wait for the window
+        await asyncio.sleep(0)
+        self._close_window()
+        await asyncio.gather(*list(self._writing), return_exceptions=True)
+
+    def _close_window(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        window, self._window = self._window, None
+        if window is not None:
+            window.set_result(None)
+
+    async def _write(self, key, write):
+        task = asyncio.current_task()
+        self._writing.add(task)
+        task.add_done_callback(self._writing.discard)
+        if self._window is None:
+            loop = asyncio.get_event_loop()
+            self._window = loop.create_future()
+            self._handle = loop.call_later(self.window, self._close_window)
+        await self._window
+        # later increments of the row go to the next update
+        self._updates.forget(key)
+        deltas = self._pending.pop(key)
+        self.writes += 1
+        await write(deltas)
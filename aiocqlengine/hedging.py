@@ -0,0 +1,70 @@
+"""
+Hedged requests for idempotent reads.
+"""
+import asyncio
+
+
+class Hedging(object):
+    """
+    Sends up to ``max_extra_attempts`` more copies of a read, each after
+    ``delay`` seconds without a response; the first successful response
+    wins and the requests still in flight are cancelled. Errors are not
+    hedged: once every request sent has failed, the first error is
+    raised.
+
+    Enabled for a model's querysets by setting it as the model's
+    ``__hedging__``, or for one queryset with ``hedge()``:
+
+    .. code-block:: python
+
+        hedging = Hedging(delay=0.02)
+        user = await User.objects.hedge(hedging).async_get(user_id=user_id)
+
+    Which replica an extra request goes to is up to the cluster's load
+    balancing policy, shuffling the replicas of a token makes hedges
+    land on another replica.
+    """
+
+    def __init__(self, delay, max_extra_attempts=1):
+        self.delay = delay
+        self.max_extra_attempts = max_extra_attempts
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+
+    def __deepcopy__(self, memo):
+        # querysets are deep copied when cloned, they share the metrics
+        return self
+
+    async def execute(self, send):
+        """
+        Returns the first successful result of awaiting ``send()``,
+        calling it again as long as hedges are due.
+        """
+        self.requests += 1
+        attempts = [asyncio.ensure_future(send())]
+        try:
+            while True:
+                hedge = len(attempts) <= self.max_extra_attempts
+                done, pending = await asyncio.wait(
+                    [attempt for attempt in attempts if not attempt.done()],
+                    timeout=self.delay if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for attempt in attempts:
+                    if attempt.done() and attempt.exception() is None:
+                        if attempt is not attempts[0]:
+                            self.won += 1
+                        return attempt.result()
+                if not pending and done:
+                    # every request sent failed
+                    raise attempts[0].exception()
+                if not done:
+                    self.fired += 1
+                    attempts.append(asyncio.ensure_future(send()))
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+                elif not attempt.cancelled():
+                    # losing errors are not worth a never retrieved warning
+                    attempt.exception()
@@ -0,0 +1,179 @@
+"""
+In-process request metrics, with a Prometheus text exporter.
+"""
+import bisect
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    """
+    Counts observations in fixed buckets of upper bounds, like a
+    Prometheus histogram.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Returns (upper bound, count of observations <= bound) pairs,
+        the last bound being infinity
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"), ),
+                                self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class OperationMetrics(object):
+    """
+    Metrics of one operation (select, insert, update, delete, batch) on
+    one model.
+
+    ``latency`` is the whole ``execute`` call, ``queue_wait`` the time
+    spent waiting for the request scheduler and ``network`` the time from
+    sending the request to its response reaching the event loop.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.pages = 0
+        self.rows = 0
+        self.request_bytes = 0
+        self.latency = Histogram(buckets)
+        self.queue_wait = Histogram(buckets)
+        self.network = Histogram(buckets)
+
+
+@contextmanager
+def _no_span():
+    yield None
+
+
+class MetricsRegistry(object):
+    """
+    Collects the metrics of the requests executed through a session,
+    enabled with ``aiosession_for_cqlengine(session, metrics=registry)``.
+
+    ``span`` is called as ``span(name, attributes=...)`` around every
+    request and must return a context manager, an OpenTelemetry tracer's
+    ``start_as_current_span`` can be passed as is:
+
+    .. code-block:: python
+
+        registry = MetricsRegistry(span=tracer.start_as_current_span)
+        aiosession_for_cqlengine(session, metrics=registry)
+        registry.operations["User", "insert"].latency.count
+        text = registry.prometheus()
+    """
+
+    def __init__(self, span=None, buckets=DEFAULT_BUCKETS,
+                 prefix="aiocqlengine"):
+        self.span = span
+        self.buckets = buckets
+        self.prefix = prefix
+        self.operations = OrderedDict()
+
+    def _operation(self, labels):
+        metrics = self.operations.get(labels)
+        if metrics is None:
+            metrics = self.operations[labels] = OperationMetrics(
+                self.buckets)
+        return metrics
+
+    def start_span(self, labels, statement):
+        if self.span is None:
+            return _no_span()
+        model, operation = labels
+        attributes = {"db.system": "cassandra", "db.operation": operation}
+        if statement is not None:
+            attributes["db.statement"] = statement
+        if model:
+            attributes["aiocqlengine.model"] = model
+        return self.span("cassandra." + operation, attributes=attributes)
+
+    def observe_request(self, labels, latency, error=False, rows=None,
+                        request_bytes=0):
+        metrics = self._operation(labels)
+        metrics.requests += 1
+        metrics.latency.observe(latency)
+        metrics.request_bytes += request_bytes
+        if error:
+            metrics.errors += 1
+        if rows is not None:
+            metrics.pages += 1
+            metrics.rows += rows
+
+    def observe_timings(self, labels, queue_wait, network):
+        metrics = self._operation(labels)
+        if queue_wait is not None:
+            metrics.queue_wait.observe(queue_wait)
+        metrics.network.observe(network)
+
+    def prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for name, attribute, help_text in (
+            ("requests_total", "requests", "Requests executed"),
+            ("errors_total", "errors", "Requests that failed"),
+            ("pages_total", "pages", "Result pages received"),
+            ("rows_total", "rows", "Rows received"),
+            ("request_bytes_total", "request_bytes",
+             "Estimated size of the requests sent"),
+        ):
+            name = "{0}_{1}".format(self.prefix, name)
+            lines.append("# HELP {0} {1}".format(name, help_text))
+            lines.append("# TYPE {0} counter".format(name))
+            for labels, metrics in self.operations.items():
+                lines.append("{0}{{{1}}} {2}".format(
+                    name, _labels(labels), getattr(metrics, attribute)))
+
+        for name, attribute, help_text in (
+            ("request_duration_seconds", "latency",
+             "Duration of execute calls"),
+            ("queue_wait_seconds", "queue_wait",
+             "Time waiting for the request scheduler"),
+            ("network_seconds", "network",
+             "Time from sending a request to its response"),
+        ):
+            name = "{0}_{1}".format(self.prefix, name)
+            lines.append("# HELP {0} {1}".format(name, help_text))
+            lines.append("# TYPE {0} histogram".format(name))
+            for labels, metrics in self.operations.items():
+                histogram = getattr(metrics, attribute)
+                label_text = _labels(labels)
+                for bound, count in histogram.cumulative():
+                    lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(
+                        name, label_text, _bound(bound), count))
+                lines.append("{0}_sum{{{1}}} {2}".format(
+                    name, label_text, histogram.sum))
+                lines.append("{0}_count{{{1}}} {2}".format(
+                    name, label_text, histogram.count))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    model, operation = labels
+    return 'model="{0}",operation="{1}"'.format(model, operation)
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
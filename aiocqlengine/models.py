@@ -1,15 +1,104 @@
+from cassandra.cqlengine import columns, connection
 from cassandra.cqlengine.models import Model, PolymorphicModelException
-from cassandra.cqlengine.query import conn, ValidationError
-from cassandra.cqlengine.statements import SelectStatement
-from cassandra.query import SimpleStatement
+from cassandra.cqlengine.query import ValidationError
 
 from aiocqlengine.query import AioDMLQuery, AioQuerySet
 
 
+class _LazyValues(dict):
+    """
+    Value managers of an instance built from a query result, each one
+    set up from the row's raw value the first time it is looked up.
+    Iterating it sets up the remaining ones.
+    """
+
+    __slots__ = ("_instance", "_row")
+
+    def __init__(self, instance, row):
+        super(_LazyValues, self).__init__()
+        self._instance = instance
+        self._row = row
+
+    def __missing__(self, name):
+        column = self._instance._columns[name]
+        row = self._row
+        if name in row:
+            value = row[name]
+        else:
+            value = column.get_default() if column.has_default else None
+        if value is not None or isinstance(column,
+                                           columns.BaseContainerColumn):
+            value = column.to_python(value)
+        value_mngr = column.value_manager(self._instance, column, value)
+        value_mngr.explicit = name in row
+        value_mngr.reset_previous_value()
+        dict.__setitem__(self, name, value_mngr)
+        if dict.__len__(self) == len(self._instance._columns):
+            # every column is set up, the row is not needed anymore
+            self._row = {}
+        return value_mngr
+
+    def _hydrate(self):
+        if dict.__len__(self) < len(self._instance._columns):
+            for name in self._instance._columns:
+                self[name]
+
+    def __contains__(self, name):
+        return name in self._instance._columns
+
+    def __iter__(self):
+        self._hydrate()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        return len(self._instance._columns)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def keys(self):
+        self._hydrate()
+        return dict.keys(self)
+
+    def values(self):
+        self._hydrate()
+        return dict.values(self)
+
+    def items(self):
+        self._hydrate()
+        return dict.items(self)
+
+
 class AioModel(Model):
     __abstract__ = True
     __dmlquery__ = AioDMLQuery
     __queryset__ = AioQuerySet
+    # build the instances of query results lazily, see _construct_lazy()
+    __lazy_hydration__ = False
+
+    @classmethod
+    def _construct_lazy(cls, values):
+        """
+        Builds an instance from a query result like _construct_instance,
+        converting a column's value only when it is first read or
+        written. Saves the conversions and copies of the columns never
+        used, of wide rows or large collections and blobs.
+        """
+        if cls._is_polymorphic:
+            return cls._construct_instance(values)
+        if cls._db_map:
+            values = dict(
+                (cls._db_map.get(k, k), v) for k, v in values.items())
+        instance = cls.__new__(cls)
+        instance._ttl = None
+        instance._timestamp = None
+        instance._conditional = None
+        instance._batch = None
+        instance._timeout = connection.NOT_SET
+        instance._is_persisted = True
+        instance._connection = None
+        instance._values = _LazyValues(instance, values)
+        return instance
 
     @classmethod
     async def async_create(cls, **kwargs):
@@ -19,6 +108,43 @@ class AioModel(Model):
                 "Incorrect columns passed: {0}".format(extra_columns))
         return await cls.objects.async_create(**kwargs)
 
+    @classmethod
+    async def async_bulk_create(cls, rows, concurrency=64,
+                                partition_batch_size=20):
+        """
+        This is a pass-through to the model objects().async_bulk_create()
+        """
+        return await cls.objects.async_bulk_create(
+            rows,
+            concurrency=concurrency,
+            partition_batch_size=partition_batch_size)
+
+    @classmethod
+    async def async_get_many(cls, keys, concurrency=32,
+                             partition_group_size=50):
+        """
+        This is a pass-through to the model objects().async_get_many()
+        """
+        return await cls.objects.async_get_many(
+            keys,
+            concurrency=concurrency,
+            partition_group_size=partition_group_size)
+
+    @classmethod
+    async def async_incr(cls, **values):
+        """
+        This is a pass-through to the model objects().async_incr()
+        """
+        return await cls.objects.async_incr(**values)
+
+    @classmethod
+    async def async_incr_many(cls, increments, concurrency=64):
+        """
+        This is a pass-through to the model objects().async_incr_many()
+        """
+        return await cls.objects.async_incr_many(increments,
+                                                 concurrency=concurrency)
+
     async def async_delete(self):
         """
         Deletes the object from the database
@@ -154,23 +280,18 @@ class AioModel(Model):
     async def async_iterate(cls,
                             fetch_size: int,
                             fields: list = None,
-                            limit: int = None):
+                            limit: int = None,
+                            resume_token: str = None):
         """Iteration by fetch_size
+
+        Yields an AioPage (a list of model instances) per page, see
+        objects().async_iterate() to stream filtered querysets. ``fields``
+        are the database column names to select.
         """
-        statement = SimpleStatement(
-            str(SelectStatement(
-                cls.column_family_name(), fields=fields, limit=limit)),
-            fetch_size=fetch_size)
-        connection = conn.get_connection()
-
-        paging_state = None
-        while True:
-            # Execute query
-            result_set = await connection.session.execute_future(
-                statement, paging_state=paging_state)
-            yield [cls(**result) for result in result_set.current_rows]
-            paging_state = result_set.paging_state
-
-            # End
-            if paging_state is None:
-                break
+        queryset = cls.objects.all().fetch_size(fetch_size).limit(limit)
+        if fields:
+            queryset = queryset.only(
+                [cls._db_map.get(field, field) for field in fields])
+        async for page in queryset.async_iterate(pages=True,
+                                                 resume_token=resume_token):
+            yield page
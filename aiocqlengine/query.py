@@ -1,11 +1,21 @@
 """
 Patch cqlengine, add async functions.
 """
+import asyncio
+import base64
+import copy
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
 from warnings import warn
+from operator import itemgetter
+import re
 import time
 
 import six
+from cassandra import InvalidRequest
+from cassandra.protocol import PreparedQueryNotFound
+from cassandra.query import (BatchStatement, BatchType, BoundStatement,
+                             bind_params)
 from cassandra.cqlengine.query import (
     DMLQuery,
     ModelQuerySet,
@@ -15,41 +25,135 @@ from cassandra.cqlengine.query import (
     ValidationError,
     EqualsOperator,
     BatchQuery,
+    QueryException,
 )
 from cassandra.cqlengine import CQLEngineException
+from cassandra.cqlengine.functions import Token
+from cassandra.cqlengine.models import BaseModel, PolymorphicModelException
+from cassandra.cqlengine.operators import (
+    GreaterThanOperator,
+    InOperator,
+    LessThanOrEqualOperator,
+)
 from cassandra.cqlengine import columns
 from cassandra.cqlengine.statements import (
     UpdateStatement,
     DeleteStatement,
     BaseCQLStatement,
     InsertStatement,
+    ContainerUpdateClause,
+    MapDeleteClause,
+    ValueQuoter,
+    WhereClause,
 )
 
+from aiocqlengine.rows import _compact_constructor
+from aiocqlengine.scheduler import _bounded_map, _check_concurrency
 
-async def _execute_statement(model,
-                             statement,
-                             consistency_level,
-                             timeout,
-                             connection=None):
+_PLACEHOLDER_RE = re.compile(r"%\((\d+)\)s")
+
+MURMUR3_MIN_TOKEN = -2**63
+MURMUR3_MAX_TOKEN = 2**63 - 1
+
+
+def _prepared_query_string(statement):
     """
-    Based on cassandra.cqlengine.query._execute_statement
+    Renders a statement with positional bind markers, returns the
+    query string and the context keys in bind marker order
+    """
+    keys = []
+
+    def _marker(match):
+        keys.append(match.group(1))
+        return "?"
+
+    return _PLACEHOLDER_RE.sub(_marker, str(statement)), keys
+
+
+async def _bind_statement(cache, statement, consistency_level):
     """
+    Returns a BoundStatement for a cqlengine statement, or None if the
+    statement can't be shared between calls
+    """
+    # timestamps are rendered inline, every call would be a new shape
+    if statement.timestamp:
+        return None
+    query_string, keys = _prepared_query_string(statement)
+    prepared = await cache.get(query_string)
+    ctx = statement.get_context()
+    values = []
+    for key in keys:
+        value = ctx[key]
+        values.append(value.value if isinstance(value, ValueQuoter) else value)
+    return BoundStatement(
+        prepared,
+        consistency_level=consistency_level,
+        fetch_size=statement.fetch_size,
+    ).bind(values)
+
+
+async def _build_statement(model, statement, consistency_level,
+                           connection=None):
+    """
+    Converts a cqlengine statement into a driver statement and its
+    parameters, routed to the statement's partition when possible
+    """
+    cache = getattr(conn.get_connection(connection).session,
+                    "prepared_statement_cache", None)
+    if cache is not None:
+        bound = await _bind_statement(cache, statement, consistency_level)
+        if bound is not None:
+            return bound, None
+
     params = statement.get_context()
     s = SimpleStatement(
         str(statement),
         consistency_level=consistency_level,
         fetch_size=statement.fetch_size,
     )
-    if model._partition_key_index:
-        key_values = statement.partition_key_values(model._partition_key_index)
-        if not any(v is None for v in key_values):
-            parts = model._routing_key_from_values(
-                key_values,
-                conn.get_cluster(connection).protocol_version)
-            s.routing_key = parts
-            s.keyspace = model._get_keyspace()
+    routing_key = _routing_key(model, statement, connection)
+    if routing_key is not None:
+        s.routing_key = routing_key
+        s.keyspace = model._get_keyspace()
+    return s, params
+
+
+def _routing_key(model, statement, connection=None):
+    """
+    Returns the routing key parts of the single partition a statement
+    targets, or None if its partition key is not fully restricted
+    """
+    if not model._partition_key_index:
+        return None
+    key_values = statement.partition_key_values(model._partition_key_index)
+    for clause in statement.where_clauses:
+        # "IN" with a single value targets a single partition as well
+        index = model._partition_key_index.get(clause.field)
+        if (index is not None and key_values[index] is None
+                and isinstance(clause.operator, InOperator)
+                and len(clause.value) == 1):
+            key_values[index] = clause.value[0]
+    if any(v is None for v in key_values):
+        return None
+    return model._routing_key_from_values(
+        key_values,
+        conn.get_cluster(connection).protocol_version)
+
+
+async def _execute_statement(model,
+                             statement,
+                             consistency_level,
+                             timeout,
+                             connection=None,
+                             paging_state=None):
+    """
+    Based on cassandra.cqlengine.query._execute_statement
+    """
     connection = connection or model._get_connection()
-    return await execute(s, params, timeout=timeout, connection=connection)
+    s, params = await _build_statement(model, statement, consistency_level,
+                                       connection)
+    return await execute(s, params, timeout=timeout, connection=connection,
+                         paging_state=paging_state, model=model)
 
 
 async def execute(
@@ -58,36 +162,522 @@ async def execute(
         consistency_level=None,
         timeout=conn.NOT_SET,
         connection=None,
+        paging_state=None,
+        deadline=None,
+        model=None,
 ):
     """
     Based on cassandra.cqlengine.connection.execute
+
+    ``deadline`` is a :func:`time.monotonic` time by which the query
+    must have completed, see ``execute_future``. ``model`` is the model
+    the query is recorded for when the session collects metrics.
     """
 
     _connection = conn.get_connection(connection)
+    metrics = getattr(_connection.session, "metrics", None)
+    if metrics is None:
+        return await _execute(_connection, query, params, consistency_level,
+                              timeout, paging_state, deadline)
+
+    text = _statement_text(query)
+    labels = (model.__name__ if model is not None else "",
+              _operation(query, text))
+    start = time.monotonic()
+    try:
+        with metrics.start_span(labels, text):
+            result = await _execute(_connection, query, params,
+                                    consistency_level, timeout, paging_state,
+                                    deadline, labels)
+    except BaseException:
+        _observe_request(metrics, labels, start, query, params)
+        raise
+    _observe_request(metrics, labels, start, query, params, result)
+    return result
+
 
+def _observe_request(metrics, labels, start, query, params, result=None):
+    latency = time.monotonic() - start
+    try:
+        request_bytes = _estimated_size(query, params)
+    except Exception:
+        # an estimate, not worth failing the request over
+        request_bytes = 0
+    metrics.observe_request(
+        labels,
+        latency,
+        error=result is None,
+        rows=(len(result.current_rows)
+              if result is not None and labels[1] == "select" else None),
+        request_bytes=request_bytes)
+
+
+def _statement_text(query):
+    if isinstance(query, BatchStatement):
+        return None
+    if isinstance(query, BoundStatement):
+        return query.prepared_statement.query_string
     if isinstance(query, SimpleStatement):
+        return query.query_string
+    return str(query)
+
+
+def _operation(query, text):
+    if isinstance(query, BatchStatement):
+        return "batch"
+    operation = text.lstrip()[:6].lower()
+    if operation in ("select", "insert", "update", "delete"):
+        return operation
+    if operation == "begin ":
+        return "batch"
+    return "other"
+
+
+async def _execute(_connection,
+                   query,
+                   params,
+                   consistency_level,
+                   timeout,
+                   paging_state,
+                   deadline,
+                   labels=None):
+    cache = getattr(_connection.session, "prepared_statement_cache", None)
+
+    if isinstance(query, (SimpleStatement, BoundStatement, BatchStatement)):
         pass  #
     elif isinstance(query, BaseCQLStatement):
-        params = query.get_context()
-        query = SimpleStatement(
-            str(query),
-            consistency_level=consistency_level,
-            fetch_size=query.fetch_size,
-        )
+        bound = None
+        if cache is not None:
+            bound = await _bind_statement(cache, query, consistency_level)
+        if bound is not None:
+            query, params = bound, None
+        else:
+            params = query.get_context()
+            query = SimpleStatement(
+                str(query),
+                consistency_level=consistency_level,
+                fetch_size=query.fetch_size,
+            )
     elif isinstance(query, str):
         query = SimpleStatement(query, consistency_level=consistency_level)
 
-    result = await _connection.session.execute_future(query,
-                                                      params,
-                                                      timeout=timeout)
+    try:
+        result = await _connection.session.execute_future(
+            query,
+            params,
+            timeout=timeout,
+            paging_state=paging_state,
+            deadline=deadline,
+            labels=labels,
+        )
+    except (InvalidRequest, PreparedQueryNotFound):
+        # the prepared statement may be stale after a schema change
+        if cache is not None and isinstance(query, BoundStatement):
+            cache.invalidate(query.prepared_statement.query_string)
+        raise
 
     return result
 
 
+_table_models = {}
+
+
+def _model_for_table(table):
+    """
+    Finds the model a statement queued in a batch was built for
+    """
+    model = _table_models.get(table)
+    if model is None:
+        classes = [BaseModel]
+        while classes:
+            klass = classes.pop()
+            classes.extend(klass.__subclasses__())
+            if getattr(klass, "__abstract__", True):
+                continue
+            try:
+                _table_models.setdefault(klass.column_family_name(), klass)
+            except CQLEngineException:
+                continue
+        model = _table_models.get(table)
+    return model
+
+
+def _estimated_size(statement, params):
+    if isinstance(statement, BoundStatement):
+        return sum(len(v) for v in statement.values if v)
+    if isinstance(statement, BatchStatement):
+        return sum((0 if prepared else len(query)) +
+                   sum(len(v) for v in values if v) for prepared, query,
+                   values in statement._statements_and_parameters)
+    if isinstance(statement, BaseCQLStatement):
+        return len(str(statement)) + sum(
+            len(str(v)) for v in statement.get_context().values())
+    query_string = getattr(statement, "query_string", statement)
+    if isinstance(params, dict):
+        params = params.values()
+    return len(query_string) + sum(len(str(v)) for v in params or ())
+
+
+def _raw_row(row):
+    return row
+
+
+_row_classes = {}
+
+
+def _row_class(model, names):
+    """
+    Returns the named tuple class used for ``as_tuples()`` rows of a
+    model and column set, built once per shape
+    """
+    key = (model, names)
+    row_class = _row_classes.get(key)
+    if row_class is None:
+        row_class = namedtuple(model.__name__ + "Row", names, rename=True)
+        _row_classes[key] = row_class
+    return row_class
+
+
+class AioPage(list):
+    """
+    One page of query results. ``resume_token`` is a string that
+    resumes the same query after this page, None on the last page.
+    """
+
+    def __init__(self, rows, paging_state):
+        super(AioPage, self).__init__(rows)
+        self.paging_state = paging_state
+
+    @property
+    def resume_token(self):
+        if self.paging_state is None:
+            return None
+        return base64.urlsafe_b64encode(self.paging_state).decode("ascii")
+
+
+def _paging_state_from_token(resume_token):
+    if resume_token is None:
+        return None
+    return base64.urlsafe_b64decode(resume_token.encode("ascii"))
+
+
+class _TokenValue(Token):
+    """
+    A raw token compared to ``pk__token``, instead of the token of
+    partition key values
+    """
+
+    def __init__(self, value):
+        super(_TokenValue, self).__init__((value, ))
+
+    def __unicode__(self):
+        return "%({0})s".format(self.context_id)
+
+    def update_context(self, ctx):
+        ctx[str(self.context_id)] = self.value[0]
+
+
+def _split_token_ring(splits):
+    step = (MURMUR3_MAX_TOKEN - MURMUR3_MIN_TOKEN) // splits
+    bounds = [MURMUR3_MIN_TOKEN + i * step for i in range(splits)]
+    bounds.append(MURMUR3_MAX_TOKEN)
+    return list(zip(bounds, bounds[1:]))
+
+
+class TokenRange(object):
+    """
+    Progress of one ``token(pk) > start AND token(pk) <= end`` range
+    of a TokenRangeScan
+    """
+
+    def __init__(self, start, end, resume_token=None, rows=0, done=False):
+        self.start = start
+        self.end = end
+        self.resume_token = resume_token
+        self.rows = rows
+        self.done = done
+
+    def as_dict(self):
+        return {
+            "start": self.start,
+            "end": self.end,
+            "resume_token": self.resume_token,
+            "rows": self.rows,
+            "done": self.done,
+        }
+
+
+class TokenRangeScan(object):
+    """
+    Scans a queryset in parallel by splitting the Murmur3 token ring
+    into sub-ranges, ``concurrency`` of them being queried at a time.
+
+    Iterating yields model instances, or an AioPage per page with
+    ``pages=True``, in no particular order. A range only advances past
+    a page once the page was handed over, so ``checkpoint()`` can be
+    saved at any point and passed back to resume the scan, re-reading
+    at most one page per range.
+    """
+
+    def __init__(self, queryset, splits, concurrency, pages=False,
+                 checkpoint=None):
+        _check_concurrency(concurrency)
+        self.queryset = queryset
+        self.concurrency = concurrency
+        self.pages = pages
+        if checkpoint is None:
+            self.ranges = [
+                TokenRange(start, end)
+                for start, end in _split_token_ring(splits)
+            ]
+        else:
+            self.ranges = [TokenRange(**r) for r in checkpoint]
+
+    @property
+    def done(self):
+        return all(token_range.done for token_range in self.ranges)
+
+    @property
+    def rows(self):
+        return sum(token_range.rows for token_range in self.ranges)
+
+    def checkpoint(self):
+        """
+        Returns a JSON serializable snapshot of the scan progress
+        """
+        return [token_range.as_dict() for token_range in self.ranges]
+
+    def _range_queryset(self, token_range):
+        token = columns._PartitionKeysToken(self.queryset.model)
+        return self.queryset.filter(
+            WhereClause(token.db_field_name,
+                        GreaterThanOperator(),
+                        _TokenValue(token_range.start),
+                        quote_field=False),
+            WhereClause(token.db_field_name,
+                        LessThanOrEqualOperator(),
+                        _TokenValue(token_range.end),
+                        quote_field=False),
+        ).limit(None).prefetch(0)
+
+    async def __aiter__(self):
+        construct = self.queryset._maybe_inject_deferred(
+            self.queryset._get_result_constructor())
+        # bounds the pages fetched but not consumed yet
+        results = asyncio.Queue(maxsize=self.concurrency)
+
+        async def _scan(token_range):
+            queryset = self._range_queryset(token_range)
+            async for page in queryset._async_pages(
+                    _paging_state_from_token(token_range.resume_token)):
+                await results.put((token_range, page))
+
+        async def _run():
+            try:
+                await _bounded_map(_scan,
+                                   [r for r in self.ranges if not r.done],
+                                   self.concurrency)
+            except Exception as exc:
+                await results.put(exc)
+            else:
+                await results.put(None)
+
+        runner = asyncio.ensure_future(_run())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                token_range, page = item
+                if self.pages:
+                    if construct is not _raw_row:
+                        page = AioPage([construct(row) for row in page],
+                                       page.paging_state)
+                    yield page
+                else:
+                    for row in page:
+                        yield construct(row)
+                token_range.resume_token = page.resume_token
+                token_range.rows += len(page)
+                token_range.done = page.paging_state is None
+        finally:
+            runner.cancel()
+
+
+# LRU of the compiled statements, bounded as sparse wide tables have
+# many shapes of non null columns
+COMPILED_STATEMENTS_SIZE = 1024
+_compiled_statements = OrderedDict()
+
+
+class _CompiledStatement(object):
+    """
+    A DML statement rendered once per model operation shape, with the
+    columns bound to its placeholders in order
+    """
+
+    def __init__(self, model, statement, columns):
+        self.query_string = str(statement)
+        self.prepared_query_string, self.keys = _prepared_query_string(
+            statement)
+        self.columns = columns
+        positions = [None] * len(model._partition_key_index)
+        for i, col in enumerate(columns):
+            index = model._partition_key_index.get(col.db_field_name)
+            if index is not None and positions[index] is None:
+                positions[index] = i
+        self.partition_key_positions = (None if None in positions else
+                                        positions)
+
+
+async def _build_compiled(model, compiled, values, consistency_level,
+                          connection):
+    """
+    Same as _build_statement for a compiled statement and its values
+    """
+    session = conn.get_connection(connection).session
+    cache = getattr(session, "prepared_statement_cache", None)
+    if cache is not None:
+        prepared = await cache.get(compiled.prepared_query_string)
+        return BoundStatement(
+            prepared, consistency_level=consistency_level).bind(values), None
+
+    s = SimpleStatement(compiled.query_string,
+                        consistency_level=consistency_level)
+    if compiled.partition_key_positions is not None:
+        s.routing_key = model._routing_key_from_values(
+            [values[i] for i in compiled.partition_key_positions],
+            conn.get_cluster(connection).protocol_version)
+        s.keyspace = model._get_keyspace()
+    return s, dict(zip(compiled.keys, values))
+
+
+def _is_simple_column(col):
+    return (type(col) not in ContainerUpdateClause.type_map
+            and not isinstance(col, columns.Counter))
+
+
+def _cache_copy(model, row):
+    # instances must not share mutable collections with the cache
+    if any(isinstance(col, columns.BaseCollectionColumn)
+           for col in model._columns.values()):
+        return copy.deepcopy(row)
+    return dict(row)
+
+
+def _invalidation_key(model, values):
+    """
+    Cache key to invalidate after writing the row with primary key
+    ``values``, None when the write can change other cached rows of the
+    partition and the whole cache has to be cleared
+    """
+    if None in values or any(col.static for col in model._columns.values()):
+        return None
+    return (model.column_family_name(), ) + tuple(values)
+
+
+_invalidating = set()
+
+
+async def _invalidate(cache, key):
+    if key is None:
+        await cache.clear()
+    else:
+        await cache.invalidate(key)
+
+
+def _invalidate_soon(cache, key, connection=None):
+    """
+    Invalidates from a batch callback, which runs in the thread that
+    executed the batch, synchronously or not
+    """
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is not None:
+        # keep a reference, the loop only holds a weak one to its tasks
+        task = running.create_task(_invalidate(cache, key))
+        _invalidating.add(task)
+        task.add_done_callback(_invalidating.discard)
+        return
+    loop = getattr(conn.get_connection(connection).session, "_asyncio_loop",
+                   None)
+    if loop is not None and loop.is_running():
+        # the loop runs in another thread, wait for it to invalidate
+        asyncio.run_coroutine_threadsafe(_invalidate(cache, key),
+                                         loop).result()
+    elif loop is not None and not loop.is_closed():
+        loop.run_until_complete(_invalidate(cache, key))
+    else:
+        new_loop = asyncio.new_event_loop()
+        try:
+            new_loop.run_until_complete(_invalidate(cache, key))
+        finally:
+            new_loop.close()
+
+
+def _invalidate_with_batch(batch, cache, key):
+    """
+    Invalidates ``key`` once ``batch`` has been executed, an AioBatchQuery
+    waits for it before returning
+    """
+    if isinstance(batch, AioBatchQuery):
+        batch._invalidations.append((cache, key))
+    else:
+        batch.add_callback(_invalidate_soon, cache, key, batch._connection)
+
+
+def _write_behind(model):
+    """
+    Returns the model's write-behind buffer if updates can be buffered
+    """
+    buffer = getattr(model, "__write_behind__", None)
+    if buffer is None or buffer.closed:
+        return None
+    return buffer
+
+
+async def _settle_write_behind(model, key=None):
+    """
+    Writes the buffered update of the row with primary key ``key``, or
+    of every row, before another write of the model
+    """
+    buffer = getattr(model, "__write_behind__", None)
+    if buffer is not None and (buffer._pending or buffer._flushing):
+        await buffer._settle(None if key is None else (
+            model.column_family_name(), ) + tuple(key))
+
+
+async def _write_behind_row(model, key, values, connection, consistency,
+                            timeout):
+    """
+    Writes the merged update of a row flushed from a write-behind buffer
+    """
+    statement = UpdateStatement(model.column_family_name(), where=[
+        WhereClause(col.db_field_name, EqualsOperator(), value)
+        for col, value in zip(model._primary_keys.values(), key)
+    ])
+    for name, value in values.items():
+        statement.add_update(model._columns[name], value)
+    try:
+        await _execute_statement(model, statement, consistency, timeout,
+                                 connection=connection)
+    finally:
+        cache = getattr(model, "__cache__", None)
+        if cache is not None:
+            await _invalidate(cache, _invalidation_key(model, list(key)))
+
+
 class AioDMLQuery(DMLQuery):
     async def _async_execute(self, statement):
         connection = (self.instance._get_connection()
                       if self.instance else self.model._get_connection())
+        if getattr(self.model, "__write_behind__", None) is not None:
+            await _settle_write_behind(self.model,
+                                       self._primary_key_values())
         if self._batch:
             if self._batch._connection:
                 if (not self._batch._connection_explicit and connection
@@ -111,23 +701,101 @@ class AioDMLQuery(DMLQuery):
                 check_applied(results)
             return results
 
+    def _can_compile(self):
+        # batches need statement objects, timestamps are rendered inline
+        return not self._batch and not self._timestamp
+
+    def _compiled(self, key, build):
+        key = (self.column_family_name, ) + key
+        compiled = _compiled_statements.get(key)
+        if compiled is None:
+            compiled = _compiled_statements[key] = build()
+            while len(_compiled_statements) > COMPILED_STATEMENTS_SIZE:
+                _compiled_statements.popitem(last=False)
+        else:
+            _compiled_statements.move_to_end(key)
+        return compiled
+
+    async def _async_execute_compiled(self, compiled, values):
+        connection = (self.instance._get_connection()
+                      if self.instance else self.model._get_connection())
+        if getattr(self.model, "__write_behind__", None) is not None:
+            await _settle_write_behind(self.model,
+                                       self._primary_key_values())
+        s, params = await _build_compiled(self.model, compiled, values,
+                                          self._consistency, connection)
+        results = await execute(s, params, timeout=self._timeout,
+                                connection=connection, model=self.model)
+        if self._if_not_exists or self._if_exists or self._conditional:
+            check_applied(results)
+        return results
+
+    def _primary_key_values(self):
+        return [
+            col.to_database(getattr(self.instance, name))
+            for name, col in self.model._primary_keys.items()
+        ]
+
+    def _invalidation_key(self):
+        return _invalidation_key(self.model, self._primary_key_values())
+
+    async def _async_invalidate_cache(self):
+        cache = getattr(self.model, "__cache__", None)
+        if cache is None:
+            return
+        if self._batch:
+            # the row changes when the batch runs
+            _invalidate_with_batch(self._batch, cache,
+                                   self._invalidation_key())
+        else:
+            await _invalidate(cache, self._invalidation_key())
+
+    def _execute(self, statement):
+        result = super(AioDMLQuery, self)._execute(statement)
+        # statements queued in a batch by the synchronous API
+        cache = getattr(self.model, "__cache__", None)
+        if cache is not None and self._batch and self.instance is not None:
+            _invalidate_with_batch(self._batch, cache,
+                                   self._invalidation_key())
+        return result
+
     async def async_delete(self):
         """ Deletes one instance """
         if self.instance is None:
             raise CQLEngineException("DML Query instance attribute is None")
 
+        where = []
+        for name, col in self.model._primary_keys.items():
+            val = getattr(self.instance, name)
+            if val is None and not col.partition_key:
+                continue
+            where.append((name, col, val))
+
+        try:
+            if self._can_compile() and not self._conditional:
+                compiled = self._compiled(
+                    ("delete", tuple(name for name, _, _ in where),
+                     self._if_exists), lambda: _CompiledStatement(
+                         self.model, self._delete_statement(where),
+                         [col for _, col, _ in where]))
+                await self._async_execute_compiled(
+                    compiled,
+                    [col.to_database(val) for _, col, val in where])
+            else:
+                await self._async_execute(self._delete_statement(where))
+        finally:
+            await self._async_invalidate_cache()
+
+    def _delete_statement(self, where):
         ds = DeleteStatement(
             self.column_family_name,
             timestamp=self._timestamp,
             conditionals=self._conditional,
             if_exists=self._if_exists,
         )
-        for name, col in self.model._primary_keys.items():
-            val = getattr(self.instance, name)
-            if val is None and not col.partition_key:
-                continue
+        for _, col, val in where:
             ds.add_where(col, EqualsOperator(), val)
-        await self._async_execute(ds)
+        return ds
 
     async def async_save(self):
         """
@@ -140,7 +808,6 @@ class AioDMLQuery(DMLQuery):
             raise CQLEngineException("DML Query intance attribute is None")
         assert type(self.instance) == self.model
 
-        nulled_fields = set()
         if self.instance._has_counter or self.instance._can_update():
             if self.instance._has_counter:
                 warn("'create' and 'save' actions on Counters are deprecated. "
@@ -148,39 +815,105 @@ class AioDMLQuery(DMLQuery):
                      "mechanism instead.")
             return await self.async_update()
         else:
-            insert = InsertStatement(
-                self.column_family_name,
-                ttl=self._ttl,
-                timestamp=self._timestamp,
-                if_not_exists=self._if_not_exists,
-            )
-            static_save_only = (False if len(
-                self.instance._clustering_keys) == 0 else True)
-            for name, col in self.instance._clustering_keys.items():
-                static_save_only = static_save_only and col._val_is_null(
-                    getattr(self.instance, name, None))
-            for name, col in self.instance._columns.items():
-                if (static_save_only and not col.static
-                        and not col.partition_key):
-                    continue
-                val = getattr(self.instance, name, None)
-                if col._val_is_null(val):
-                    if self.instance._values[name].changed:
-                        nulled_fields.add(col.db_field_name)
-                    continue
-                if col.has_default and not self.instance._values[name].changed:
-                    # Ensure default columns included in a save()
-                    # are marked as explicit, to get them *persisted* properly
-                    self.instance._values[name].explicit = True
-                insert.add_assignment(col, getattr(self.instance, name, None))
-
-        # skip query execution if it's empty
-        # caused by pointless update queries
-        if not insert.is_empty:
-            await self._async_execute(insert)
-        # delete any nulled columns
-        if not static_save_only:
-            self._delete_null_columns()
+            assignments, static_save_only = self._insert_assignments()
+
+        try:
+            # skip query execution if it's empty
+            # caused by pointless update queries
+            if assignments:
+                if self._can_compile():
+                    compiled = self._compiled(
+                        ("insert", tuple(name for name, _, _ in assignments),
+                         self._ttl, self._if_not_exists),
+                        lambda: _CompiledStatement(
+                            self.model,
+                            self._insert_statement(assignments)[0],
+                            [col for _, col, _ in assignments]))
+                    await self._async_execute_compiled(compiled, [
+                        col.to_database(val) for _, col, val in assignments
+                    ])
+                else:
+                    await self._async_execute(
+                        self._insert_statement(assignments)[0])
+            # delete any nulled columns
+            if not static_save_only:
+                await self._async_delete_null_columns()
+        finally:
+            await self._async_invalidate_cache()
+
+    async def _async_delete_null_columns(self, conditionals=None):
+        """
+        executes a delete query to remove columns that have changed to null
+        """
+        ds = DeleteStatement(self.column_family_name,
+                             conditionals=conditionals,
+                             if_exists=self._if_exists)
+        deleted_fields = False
+        static_only = True
+        for _, v in self.instance._values.items():
+            col = v.column
+            if v.deleted:
+                ds.add_field(col.db_field_name)
+                deleted_fields = True
+                static_only &= col.static
+            elif isinstance(col, columns.Map):
+                uc = MapDeleteClause(col.db_field_name, v.value,
+                                     v.previous_value)
+                if uc.get_context_size() > 0:
+                    ds.add_field(uc)
+                    deleted_fields = True
+                    static_only |= col.static
+
+        if deleted_fields:
+            keys = (self.model._partition_keys
+                    if static_only else self.model._primary_keys)
+            for name, col in keys.items():
+                ds.add_where(col, EqualsOperator(),
+                             getattr(self.instance, name))
+            await self._async_execute(ds)
+
+    def _insert_assignments(self):
+        """
+        Returns the (name, column, value) assigned by a blind insert of
+        the instance, and whether only static columns are saved
+        """
+        static_save_only = (False if len(
+            self.instance._clustering_keys) == 0 else True)
+        for name, col in self.instance._clustering_keys.items():
+            static_save_only = static_save_only and col._val_is_null(
+                getattr(self.instance, name, None))
+        assignments = []
+        for name, col in self.instance._columns.items():
+            if (static_save_only and not col.static
+                    and not col.partition_key):
+                continue
+            val = getattr(self.instance, name, None)
+            if col._val_is_null(val):
+                continue
+            if col.has_default and not self.instance._values[name].changed:
+                # Ensure default columns included in a save()
+                # are marked as explicit, to get them *persisted* properly
+                self.instance._values[name].explicit = True
+            assignments.append((name, col, val))
+        return assignments, static_save_only
+
+    def _insert_statement(self, assignments=None):
+        """
+        Builds the InsertStatement for a blind insert of the instance,
+        returns it with whether only static columns are saved
+        """
+        static_save_only = None
+        if assignments is None:
+            assignments, static_save_only = self._insert_assignments()
+        insert = InsertStatement(
+            self.column_family_name,
+            ttl=self._ttl,
+            timestamp=self._timestamp,
+            if_not_exists=self._if_not_exists,
+        )
+        for _, col, val in assignments:
+            insert.add_assignment(col, val)
+        return insert, static_save_only
 
     async def async_update(self):
         """
@@ -195,17 +928,11 @@ class AioDMLQuery(DMLQuery):
         null_clustering_key = (False if len(
             self.instance._clustering_keys) == 0 else True)
         static_changed_only = True
-        statement = UpdateStatement(
-            self.column_family_name,
-            ttl=self._ttl,
-            timestamp=self._timestamp,
-            conditionals=self._conditional,
-            if_exists=self._if_exists,
-        )
         for name, col in self.instance._clustering_keys.items():
             null_clustering_key = null_clustering_key and col._val_is_null(
                 getattr(self.instance, name, None))
 
+        updates = []
         updated_columns = set()
         # get defined fields and their column names
         for name, col in self.model._columns.items():
@@ -225,38 +952,105 @@ class AioDMLQuery(DMLQuery):
                     continue
 
                 static_changed_only = static_changed_only and col.static
-                statement.add_update(col, val, previous=val_mgr.previous_value)
+                updates.append((name, col, val, val_mgr.previous_value))
                 updated_columns.add(col.db_field_name)
 
-        if statement.assignments:
-            for name, col in self.model._primary_keys.items():
-                # only include clustering key if clustering key is not null,
-                # and non static columns are changed to avoid cql error
-                if (null_clustering_key
-                        or static_changed_only) and (not col.partition_key):
-                    continue
-                statement.add_where(col, EqualsOperator(),
-                                    getattr(self.instance, name))
-            await self._async_execute(statement)
+        where = []
+        for name, col in self.model._primary_keys.items():
+            # only include clustering key if clustering key is not null,
+            # and non static columns are changed to avoid cql error
+            if (null_clustering_key
+                    or static_changed_only) and (not col.partition_key):
+                continue
+            where.append((name, col, getattr(self.instance, name)))
+
+        buffer = _write_behind(self.model)
+        if (buffer is not None and updates and not null_clustering_key
+                and not self._batch and not self._conditional
+                and not self._if_exists and self._ttl is None
+                and self._timestamp is None
+                and all(_is_simple_column(col) and not col.static
+                        for _, col, _, _ in updates)
+                and not any(v.deleted
+                            for v in self.instance._values.values())):
+            await self._async_buffer_update(buffer, {
+                name: val for name, _, val, _ in updates})
+            return
 
-        if not null_clustering_key:
-            # remove conditions on fields that have been updated
-            delete_conditionals = ([
-                condition for condition in self._conditional
-                if condition.field not in updated_columns
-            ] if self._conditional else None)
-            self._delete_null_columns(delete_conditionals)
+        try:
+            await self._async_update_row(updates, where)
+            if not null_clustering_key:
+                # remove conditions on fields that have been updated
+                delete_conditionals = ([
+                    condition for condition in self._conditional
+                    if condition.field not in updated_columns
+                ] if self._conditional else None)
+                await self._async_delete_null_columns(delete_conditionals)
+        finally:
+            await self._async_invalidate_cache()
+
+    async def _async_buffer_update(self, buffer, values):
+        connection = self.instance._get_connection()
+        key = tuple(self._primary_key_values())
+        consistency, timeout = self._consistency, self._timeout
+        await buffer.add(
+            (self.column_family_name, ) + key, values,
+            lambda merged: _write_behind_row(self.model, key, merged,
+                                             connection, consistency,
+                                             timeout))
+
+    async def _async_update_row(self, updates, where):
+        if (updates and self._can_compile() and not self._conditional
+                and all(_is_simple_column(col) for _, col, _, _ in updates)):
+            compiled = self._compiled(
+                ("update", tuple(name for name, _, _, _ in updates),
+                 tuple(name for name, _, _ in where), self._ttl,
+                 self._if_exists), lambda: _CompiledStatement(
+                     self.model, self._update_statement(updates, where),
+                     [col for _, col, _, _ in updates] +
+                     [col for _, col, _ in where]))
+            await self._async_execute_compiled(
+                compiled, [col.to_database(val)
+                           for _, col, val, _ in updates] +
+                [col.to_database(val) for _, col, val in where])
+        else:
+            statement = self._update_statement(updates, where)
+            if statement.assignments:
+                await self._async_execute(statement)
+
+    def _update_statement(self, updates, where):
+        statement = UpdateStatement(
+            self.column_family_name,
+            ttl=self._ttl,
+            timestamp=self._timestamp,
+            conditionals=self._conditional,
+            if_exists=self._if_exists,
+        )
+        for _, col, val, previous in updates:
+            statement.add_update(col, val, previous=previous)
+        if statement.assignments:
+            for _, col, val in where:
+                statement.add_where(col, EqualsOperator(), val)
+        return statement
 
 
 class AioQuerySet(ModelQuerySet):
+    _prefetch = 1
+    _row_mode = None
+    _hedging = None
+    _lazy = None
 
     async def _async_execute_query(self):
         if self._batch:
             raise CQLEngineException("Only inserts, updates, "
                                      "and deletes are available in batch mode")
         if self._result_cache is None:
-            results = await self._async_execute(self._select_query())
-            self._result_generator = (i for i in results)
+            # page through asynchronously, iterating the driver's ResultSet
+            # would fetch the following pages on the event loop thread
+            rows = []
+            async for page in self._async_pages():
+                rows.extend(page)
+            self._result_generator = (i for i in rows)
             self._result_cache = []
             self._construct_result = self._maybe_inject_deferred(
                 self._get_result_constructor())
@@ -267,7 +1061,253 @@ class AioQuerySet(ModelQuerySet):
             if self._materialize_results or self._distinct_fields:
                 self._fill_result_cache()
 
+    async def _async_pages(self, paging_state=None, statement=None):
+        """
+        Yields the select query results as AioPage of raw rows, starting
+        at ``paging_state``. Up to ``prefetch`` following pages, fetched
+        or being fetched, are kept while the current one is consumed.
+        """
+        if self._batch:
+            raise CQLEngineException("Only inserts, updates, "
+                                     "and deletes are available in batch mode")
+        if statement is None:
+            statement = self._select_query()
+        connection = self._connection or self.model._get_connection()
+        session = conn.get_connection(connection).session
+        single_flight = getattr(session, "single_flight", None)
+        hedging = (self._hedging if self._hedging is not None else getattr(
+            self.model, "__hedging__", None))
+
+        async def _send(paging_state):
+            return await _execute_statement(
+                self.model,
+                statement,
+                self._consistency,
+                self._timeout,
+                connection=connection,
+                paging_state=paging_state,
+            )
+
+        async def _execute(paging_state):
+            if not hedging:
+                return await _send(paging_state)
+            return await hedging.execute(lambda: _send(paging_state))
+
+        async def _fetch(paging_state):
+            if single_flight is None:
+                result_set = await _execute(paging_state)
+                return AioPage(result_set.current_rows,
+                               result_set.paging_state)
+            # the query with its values inlined, the context holds
+            # quoters compared by identity
+            key = (connection,
+                   bind_params(str(statement), statement.get_context(),
+                               session.encoder), statement.fetch_size,
+                   self._consistency, paging_state)
+            result_set = await single_flight.run(
+                key, lambda: _execute(paging_state))
+            rows = result_set.current_rows
+            if self._row_mode == "dict":
+                # the rows are shared with the other callers
+                rows = [dict(row) for row in rows]
+            return AioPage(rows, result_set.paging_state)
+
+        if not self._prefetch:
+            while True:
+                page = await _fetch(paging_state)
+                paging_state = page.paging_state
+                yield page
+                if paging_state is None:
+                    return
+
+        pages = asyncio.Queue()
+        # a page holds a slot from when it is requested until it is
+        # handed over, so the pages kept are the current one + prefetch
+        slots = asyncio.Semaphore(self._prefetch)
+
+        async def _produce(paging_state):
+            try:
+                while True:
+                    await slots.acquire()
+                    page = await _fetch(paging_state)
+                    paging_state = page.paging_state
+                    await pages.put(page)
+                    if paging_state is None:
+                        break
+            except Exception as exc:
+                await pages.put(exc)
+            else:
+                await pages.put(None)
+
+        producer = asyncio.ensure_future(_produce(paging_state))
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                slots.release()
+                yield page
+        finally:
+            producer.cancel()
+
+    async def __aiter__(self):
+        construct = self._maybe_inject_deferred(self._get_result_constructor())
+        async for page in self._async_pages():
+            for row in page:
+                yield construct(row)
+
+    async def async_iterate(self, pages=False, resume_token=None):
+        """
+        Streams the query results, keeping in memory the page being
+        consumed and up to ``prefetch`` more. Filters, ``only``/``defer``,
+        ``consistency``, ``timeout``, ``fetch_size`` and ``using`` of the
+        queryset are honored.
+
+        Yields model instances (or ``values_list`` rows), or with
+        ``pages=True`` an :class:`AioPage` per page whose ``resume_token``
+        can be stored and passed back as ``resume_token`` to continue
+        the same query after that page.
+        """
+        construct = self._maybe_inject_deferred(self._get_result_constructor())
+        async for page in self._async_pages(
+                _paging_state_from_token(resume_token)):
+            if pages:
+                if construct is not _raw_row:
+                    page = AioPage([construct(row) for row in page],
+                                   page.paging_state)
+                yield page
+            else:
+                for row in page:
+                    yield construct(row)
+
+    def parallel_scan(self, splits=None, concurrency=8, pages=False,
+                      checkpoint=None):
+        """
+        Returns a :class:`TokenRangeScan` that streams the queryset by
+        querying ``splits`` token ranges, ``concurrency`` at a time.
+        ``splits`` defaults to four ranges per host in the cluster. The
+        queryset's limit is not applied, every matching row is read.
+
+        .. code-block:: python
+
+            scan = User.objects.parallel_scan(concurrency=16)
+            async for user in scan:
+                export(user)
+                save(scan.checkpoint())
+        """
+        if self._batch:
+            raise CQLEngineException("Only inserts, updates, "
+                                     "and deletes are available in batch mode")
+        connection = self._connection or self.model._get_connection()
+        metadata = conn.get_cluster(connection).metadata
+        partitioner = getattr(metadata, "partitioner", None)
+        if partitioner and not partitioner.endswith("Murmur3Partitioner"):
+            raise CQLEngineException(
+                "parallel_scan requires the Murmur3Partitioner, "
+                "got {0}".format(partitioner))
+        if splits is None and checkpoint is None:
+            splits = 4 * max(1, len(metadata.all_hosts()))
+        return TokenRangeScan(self, splits, concurrency, pages=pages,
+                              checkpoint=checkpoint)
+
+    def as_dicts(self):
+        """
+        Returns rows as the dicts decoded by the driver, keyed by column
+        name, instead of building model instances. Rows are read-only
+        snapshots, for hot read paths that never save them back.
+        """
+        clone = copy.deepcopy(self)
+        clone._row_mode = "dict"
+        return clone
+
+    def as_tuples(self):
+        """
+        Returns rows as named tuples of the selected model columns
+        instead of model instances. The tuple class is built once per
+        model and column set.
+        """
+        clone = copy.deepcopy(self)
+        clone._row_mode = "tuple"
+        return clone
+
+    def compact(self):
+        """
+        Returns rows as read-only :class:`~aiocqlengine.rows.CompactRow`
+        of the model columns, held in slots without value managers or
+        per row state, for large results kept in memory. ``to_model()``
+        of a row returns a model instance.
+        """
+        clone = copy.deepcopy(self)
+        clone._row_mode = "compact"
+        return clone
+
+    def _get_result_constructor(self):
+        if self._row_mode == "dict":
+            return _raw_row
+        if self._row_mode == "compact":
+            return _compact_constructor(self.model)
+        if self._row_mode == "tuple":
+            fields = self._select_fields()
+            selected = set(fields) | set(self._deferred_values)
+            cols = [(name, col.db_field_name)
+                    for name, col in self.model._columns.items()
+                    if not fields or col.db_field_name in selected]
+            row_class = _row_class(self.model,
+                                   tuple(name for name, _ in cols))
+            getter = itemgetter(*[db_name for _, db_name in cols])
+            if len(cols) == 1:
+                return lambda row: tuple.__new__(row_class, (getter(row), ))
+            return lambda row: tuple.__new__(row_class, getter(row))
+        lazy = (self._lazy if self._lazy is not None else getattr(
+            self.model, "__lazy_hydration__", False))
+        if lazy and not self._values_list:
+            return self.model._construct_lazy
+        return super(AioQuerySet, self)._get_result_constructor()
+
+    def lazy(self, enabled=True):
+        """
+        Builds the model instances of the results converting each column
+        only when it is first used, or eagerly with ``enabled=False``,
+        whatever the model's ``__lazy_hydration__``.
+        """
+        clone = copy.deepcopy(self)
+        clone._lazy = enabled
+        return clone
+
+    def prefetch(self, depth):
+        """
+        Sets how many pages ``async for`` fetches ahead of the page
+        being consumed, 0 fetches each page on demand.
+
+        .. code-block:: python
+
+            async for user in User.objects().fetch_size(500).prefetch(2):
+                print(user)
+        """
+        if not isinstance(depth, int):
+            raise TypeError
+        if depth < 0:
+            raise QueryException("prefetch depth less than 0 is not allowed")
+
+        clone = copy.deepcopy(self)
+        clone._prefetch = depth
+        return clone
+
+    def hedge(self, hedging):
+        """
+        Sets the :class:`~aiocqlengine.hedging.Hedging` of the query's
+        reads, None disables the hedging set on the model.
+        """
+        clone = copy.deepcopy(self)
+        clone._hedging = hedging if hedging is not None else False
+        return clone
+
     async def _async_execute(self, statement):
+        if getattr(self.model, "__write_behind__", None) is not None:
+            await _settle_write_behind(self.model,
+                                       self._primary_key_values())
         if self._batch:
             return self._batch.add_query(statement)
         else:
@@ -290,15 +1330,366 @@ class AioQuerySet(ModelQuerySet):
                     self._if_exists).using(connection=self._connection
                                            ).async_save())
 
-    async def async_first(self):
-        await self._async_execute_query()
+    async def async_bulk_create(self, rows, concurrency=64,
+                                partition_batch_size=20):
+        """
+        Inserts many rows with at most ``concurrency`` requests in flight.
+
+        ``rows`` may hold dicts of column values or model instances, all
+        of them are validated before anything is written. Rows that share
+        a partition are written together as unlogged batches of up to
+        ``partition_batch_size`` inserts. Returns a list in input order
+        with the saved instance, or the exception raised for that row.
+
+        With ``if_not_exists()`` every row is inserted by its own
+        lightweight transaction, a row that already exists gets an
+        ``LWTException``.
+        """
+        if self._batch:
+            raise CQLEngineException(
+                "async_bulk_create is not available in batch mode")
+        if self._if_exists or self._conditional:
+            raise CQLEngineException(
+                "async_bulk_create only supports if_not_exists() conditions")
+        if self._if_not_exists:
+            # conditional inserts of a batch would all apply or none
+            partition_batch_size = 1
+        connection = self._connection or self.model._get_connection()
+        protocol_version = conn.get_cluster(connection).protocol_version
+
+        results = []
+        partitions = OrderedDict()
+        for row in rows:
+            index = len(results)
+            try:
+                instance = self._bulk_instance(row)
+                dml = self.model.__dmlquery__(
+                    self.model,
+                    instance,
+                    ttl=self._ttl,
+                    timestamp=self._timestamp,
+                    if_not_exists=self._if_not_exists,
+                )
+                insert, _ = dml._insert_statement()
+            except Exception as exc:
+                results.append(exc)
+                continue
+            results.append(instance)
+            if insert.is_empty:
+                continue
+            routing_key = tuple(
+                self.model._routing_key_from_values(
+                    insert.partition_key_values(
+                        self.model._partition_key_index), protocol_version))
+            partitions.setdefault(routing_key, []).append(
+                (index, insert, dml))
+
+        units = [
+            inserts[i:i + partition_batch_size]
+            for inserts in partitions.values()
+            for i in range(0, len(inserts), partition_batch_size)
+        ]
+
+        async def _write(unit):
+            if len(unit) == 1:
+                result = await _execute_statement(self.model, unit[0][1],
+                                                  self._consistency,
+                                                  self._timeout,
+                                                  connection=connection)
+                if self._if_not_exists:
+                    check_applied(result)
+                return
+            batch = BatchStatement(
+                BatchType.UNLOGGED,
+                consistency_level=self._consistency,
+                session=conn.get_connection(connection).session,
+            )
+            for _, insert, _ in unit:
+                s, params = await _build_statement(self.model, insert,
+                                                   self._consistency,
+                                                   connection)
+                batch.add(s, params)
+            await execute(batch, timeout=self._timeout, connection=connection,
+                          model=self.model)
+
+        async def _write_unit(unit):
+            try:
+                # like async_save, a buffered update of a row is written
+                # first and its cached copy invalidated once written
+                if getattr(self.model, "__write_behind__", None) is not None:
+                    for _, _, dml in unit:
+                        await _settle_write_behind(self.model,
+                                                   dml._primary_key_values())
+                try:
+                    await _write(unit)
+                finally:
+                    for _, _, dml in unit:
+                        await dml._async_invalidate_cache()
+            except Exception as exc:
+                for index, _, _ in unit:
+                    results[index] = exc
 
+        await _bounded_map(_write_unit, units, concurrency)
+
+        for instance in results:
+            if isinstance(instance, self.model):
+                instance._set_persisted()
+                instance._timestamp = None
+        return results
+
+    def _bulk_instance(self, row):
+        if isinstance(row, self.model):
+            instance = row
+        else:
+            extra_columns = set(row.keys()) - set(self.model._columns.keys())
+            if extra_columns:
+                raise ValidationError(
+                    "Incorrect columns passed: {0}".format(extra_columns))
+            instance = self.model(**row)
+
+        # handle polymorphic models
+        if instance._is_polymorphic:
+            if instance._is_polymorphic_base:
+                raise PolymorphicModelException(
+                    "cannot save polymorphic base model")
+            else:
+                setattr(instance, instance._discriminator_column_name,
+                        instance.__discriminator_value__)
+        instance.validate()
+        return instance
+
+    async def async_incr(self, **values):
+        """
+        Adds to counter columns of one row, without reading it::
+
+            await PageViews.objects.async_incr(page_id=page_id, views=1)
+
+        ``values`` holds the primary key and the delta of each counter
+        column to change. Calls on the same row are merged into a single
+        update when the model has a ``__counter_coalescer__``, see
+        :class:`~aiocqlengine.counters.IncrementCoalescer`.
+        """
+        if self._batch:
+            raise CQLEngineException(
+                "async_incr is not available in batch mode")
+        key, deltas = self._increment(values)
+        connection = self._connection or self.model._get_connection()
+        coalescer = getattr(self.model, "__counter_coalescer__", None)
+        if coalescer is None:
+            await self._async_incr_row(key, deltas, connection)
+            return
+        await coalescer.add(
+            (self.column_family_name, connection, self._consistency, key),
+            deltas, lambda merged: self._async_incr_row(
+                key, merged, connection))
+
+    async def async_incr_many(self, increments, concurrency=64):
+        """
+        Adds to counter columns of many rows, ``increments`` holding the
+        ``async_incr`` values of each. Deltas for the same row are summed
+        and sent as a single update, with at most ``concurrency`` updates
+        in flight. Once every row has been attempted, the first error
+        raised is raised again: counter updates are not idempotent, the
+        other rows are applied.
+        """
+        if self._batch:
+            raise CQLEngineException(
+                "async_incr_many is not available in batch mode")
+        connection = self._connection or self.model._get_connection()
+        rows = OrderedDict()
+        for values in increments:
+            key, deltas = self._increment(values)
+            merged = rows.setdefault(key, {})
+            for name, delta in deltas.items():
+                merged[name] = merged.get(name, 0) + delta
+
+        errors = []
+
+        async def _incr(row):
+            try:
+                await self._async_incr_row(row[0], row[1], connection)
+            except Exception as exc:
+                errors.append(exc)
+
+        await _bounded_map(_incr, rows.items(), concurrency)
+        if errors:
+            raise errors[0]
+
+    def _increment(self, values):
+        """
+        Splits ``async_incr`` values into the primary key values and the
+        counter deltas
+        """
+        extra_columns = set(values.keys()) - set(self.model._columns.keys())
+        if extra_columns:
+            raise ValidationError(
+                "Incorrect columns passed: {0}".format(extra_columns))
+        key = []
+        for name, col in self.model._primary_keys.items():
+            if values.get(name) is None:
+                raise ValidationError(
+                    "async_incr needs the primary key column {0}".format(name))
+            key.append(col.validate(values[name]))
+        deltas = {}
+        for name, value in values.items():
+            col = self.model._columns[name]
+            if col.is_primary_key:
+                continue
+            if not isinstance(col, columns.Counter):
+                raise ValidationError(
+                    "{0} is not a counter column".format(name))
+            deltas[name] = col.validate(value)
+        return tuple(key), deltas
+
+    async def _async_incr_row(self, key, deltas, connection):
+        statement = UpdateStatement(self.column_family_name)
+        for name, delta in deltas.items():
+            if delta:
+                statement.add_update(self.model._columns[name], delta,
+                                     previous=0)
+        if not statement.assignments:
+            return
+        for col, value in zip(self.model._primary_keys.values(), key):
+            statement.add_where(col, EqualsOperator(), value)
         try:
-            obj = self[0]
-        except IndexError:
+            await _execute_statement(self.model, statement,
+                                     self._consistency, self._timeout,
+                                     connection=connection)
+        finally:
+            cache = getattr(self.model, "__cache__", None)
+            if cache is not None:
+                await _invalidate(cache, _invalidation_key(
+                    self.model, [
+                        col.to_database(value) for col, value in zip(
+                            self.model._primary_keys.values(), key)
+                    ]))
+
+    def _cache_key(self):
+        """
+        Model cache key of a lookup by full primary key, None when the
+        model has no cache or the query is anything else
+        """
+        if getattr(self.model, "__cache__", None) is None:
             return None
-        
-        return obj
+        # equality filters defer the filtered columns, any other
+        # deferred or only fields change the selected row
+        if (self._only_fields or self._distinct_fields
+                or not self._defer_fields <= set(self._deferred_values)):
+            return None
+        key = self._primary_key_values()
+        if key is None:
+            return None
+        return (self.column_family_name, ) + key
+
+    def _primary_key_values(self):
+        """
+        Database values of the primary key when the query filters every
+        primary key column by equality, None otherwise
+        """
+        values = {}
+        for where in self._where:
+            if (not isinstance(where.operator, EqualsOperator)
+                    or isinstance(where.value, Token)):
+                return None
+            values[where.field] = where.value
+        keys = self.model._primary_keys.values()
+        if set(values) != set(col.db_field_name for col in keys):
+            return None
+        return tuple(values[col.db_field_name] for col in keys)
+
+    async def _async_cached(self, key):
+        """
+        Returns the object of a full primary key lookup through the
+        model cache, None if the row does not exist
+        """
+        async def _load():
+            async for page in self.prefetch(0)._async_pages():
+                if page:
+                    return page[0]
+            return None
+
+        row = await self.model.__cache__.get(key, _load)
+        if row is None:
+            return None
+        construct = self._maybe_inject_deferred(self._get_result_constructor())
+        return construct(_cache_copy(self.model, row))
+
+    def _key_select_query(self):
+        """
+        Select query of the first primary key column only, for reading
+        which rows match without transferring them
+        """
+        statement = self._select_query()
+        if not self._distinct_fields:
+            statement.fields = [
+                next(iter(self.model._primary_keys.values())).db_field_name
+            ]
+        return statement
+
+    async def async_count(self, paged=False):
+        """
+        Returns the number of rows matched by the query, with a
+        ``SELECT COUNT(*)``.
+
+        With ``paged=True`` the matching rows are paged through instead,
+        selecting a single key column and summing the page sizes, so
+        that counting a very large partition is not one long server side
+        aggregation. Distinct queries are always counted this way. Like
+        ``COUNT(*)``, a paged count is not capped by the query limit.
+        """
+        if self._batch:
+            raise CQLEngineException("Only inserts, updates, "
+                                     "and deletes are available in batch mode")
+        if paged or self._distinct_fields:
+            statement = self._key_select_query()
+            statement.limit = None
+            count = 0
+            async for page in self._async_pages(statement=statement):
+                count += len(page)
+            return count
+
+        statement = self._select_query()
+        statement.count = True
+        result = await _execute_statement(
+            self.model,
+            statement,
+            self._consistency,
+            self._timeout,
+            connection=self._connection or self.model._get_connection(),
+        )
+        return result.one().popitem()[1]
+
+    async def async_exists(self):
+        """
+        Returns whether any row matches the query, reading at most one
+        key column of one row.
+        """
+        if self._batch:
+            raise CQLEngineException("Only inserts, updates, "
+                                     "and deletes are available in batch mode")
+        statement = self._key_select_query()
+        statement.limit = 1
+        async for page in self.prefetch(0)._async_pages(statement=statement):
+            if page:
+                return True
+        return False
+
+    def _limited(self, rows):
+        """
+        Returns the queryset selecting at most ``rows`` rows, for reads
+        that only look at the first ones
+        """
+        if self._limit and self._limit <= rows:
+            return self
+        return self.limit(rows)
+
+    async def async_first(self):
+        key = self._cache_key()
+        if key is not None:
+            return await self._async_cached(key)
+        async for obj in self._limited(1).prefetch(0):
+            return obj
+        return None
 
     async def async_all(self):
         await self._async_execute_query()
@@ -308,29 +1699,118 @@ class AioQuerySet(ModelQuerySet):
         if args or kwargs:
             return await self.filter(*args, **kwargs).async_get()
 
-        await self._async_execute_query()
+        key = self._cache_key()
+        if key is not None:
+            obj = await self._async_cached(key)
+            if obj is None:
+                raise self.model.DoesNotExist
+            return obj
+
+        # two rows are enough to tell one object from several
+        queryset = self._limited(2)
+        await queryset._async_execute_query()
 
         # Check that the resultset only contains one element,
         # avoiding sending a COUNT query
         try:
-            self[1]
+            queryset[1]
             raise self.model.MultipleObjectsReturned("Multiple objects found")
         except IndexError:
             pass
 
         try:
-            obj = self[0]
+            obj = queryset[0]
         except IndexError:
             raise self.model.DoesNotExist
 
         return obj
 
+    async def async_get_many(self, keys, concurrency=32,
+                             partition_group_size=50):
+        """
+        Fetches the objects of many primary keys with at most
+        ``concurrency`` requests in flight, returns a dict of the found
+        objects keyed by primary key; missing keys are absent.
+
+        ``keys`` are primary key values, or for compound primary keys
+        tuples of the values in primary key order or dicts of column
+        values. Each request reads a single partition and is routed to
+        its replicas. Keys of a partition differing only by the last
+        clustering column are read together, ``partition_group_size``
+        per ``IN``.
+        """
+        primary_keys = list(self.model._primary_keys.items())
+        partition_size = len(self.model._partition_keys)
+        names = [name for name, _ in primary_keys]
+
+        # rows are matched to the keys on their database values, which the
+        # keys may only be equal to once stored: timestamps lose their
+        # microseconds and time zone
+        requested = {}
+        for key in keys:
+            if isinstance(key, dict):
+                key = tuple(key[name] for name in names)
+            elif len(primary_keys) == 1 or not isinstance(key, (tuple, list)):
+                key = (key, )
+            if len(key) != len(primary_keys):
+                raise QueryException(
+                    "Keys of {0} must have {1} values".format(
+                        self.model.__name__, len(primary_keys)))
+            key = tuple(col.validate(value)
+                        for (_, col), value in zip(primary_keys, key))
+            requested[tuple(
+                col.to_database(value)
+                for (_, col), value in zip(primary_keys, key))] = key
+
+        if self._row_mode == "dict":
+
+            def _row_key(row):
+                return tuple(
+                    col.to_database(col.to_python(row[col.db_field_name]))
+                    for _, col in primary_keys)
+        else:
+
+            def _row_key(row):
+                return tuple(
+                    col.to_database(getattr(row, name))
+                    for name, col in primary_keys)
+
+        if len(primary_keys) - partition_size == 1:
+            # group the clustering values of each partition
+            partitions = OrderedDict()
+            for key in requested.values():
+                partitions.setdefault(key[:-1], []).append(key[-1])
+            units = [(prefix, values[i:i + partition_group_size])
+                     for prefix, values in partitions.items()
+                     for i in range(0, len(values), partition_group_size)]
+        else:
+            units = [(key, None) for key in requested.values()]
+
+        found = {}
+
+        async def _read(unit):
+            prefix, values = unit
+            filters = dict(zip(names, prefix))
+            if values is not None:
+                if len(values) == 1:
+                    filters[names[-1]] = values[0]
+                else:
+                    filters[names[-1] + "__in"] = values
+            async for obj in self.filter(**filters).prefetch(0):
+                key = requested.get(_row_key(obj))
+                if key is not None:
+                    found[key if len(key) > 1 else key[0]] = obj
+
+        await _bounded_map(_read, units, concurrency)
+        return found
+
     async def async_update(self, **values):
         if not values:
             return
 
         nulled_columns = set()
         updated_columns = set()
+        buffered = {}
         us = UpdateStatement(
             self.column_family_name,
             where=self._where,
@@ -369,26 +1849,135 @@ class AioQuerySet(ModelQuerySet):
 
             us.add_update(col, val, operation=col_op)
             updated_columns.add(col_name)
+            if col_op is None and _is_simple_column(col) and not col.static:
+                buffered[col_name] = val
 
-        if us.assignments:
-            await self._async_execute(us)
-
-        if nulled_columns:
-            delete_conditional = ([
-                condition for condition in self._conditional
-                if condition.field not in updated_columns
-            ] if self._conditional else None)
-            ds = DeleteStatement(
-                self.column_family_name,
-                fields=nulled_columns,
-                where=self._where,
-                conditionals=delete_conditional,
-                if_exists=self._if_exists,
-            )
-            await self._async_execute(ds)
+        buffer = _write_behind(self.model)
+        key = self._primary_key_values() if buffer is not None else None
+        if (key is not None and len(buffered) == len(values)
+                and not self._batch and not self._conditional
+                and not self._if_exists and self._ttl is None
+                and self._timestamp is None):
+            connection = self._connection or self.model._get_connection()
+            consistency, timeout = self._consistency, self._timeout
+            await buffer.add(
+                (self.column_family_name, ) + key, buffered,
+                lambda merged: _write_behind_row(self.model, key, merged,
+                                                 connection, consistency,
+                                                 timeout))
+            return
+
+        try:
+            if us.assignments:
+                await self._async_execute(us)
+
+            if nulled_columns:
+                delete_conditional = ([
+                    condition for condition in self._conditional
+                    if condition.field not in updated_columns
+                ] if self._conditional else None)
+                ds = DeleteStatement(
+                    self.column_family_name,
+                    fields=nulled_columns,
+                    where=self._where,
+                    conditionals=delete_conditional,
+                    if_exists=self._if_exists,
+                )
+                await self._async_execute(ds)
+        finally:
+            await self._async_invalidate_cache()
+
+    async def _async_invalidate_cache(self):
+        cache = getattr(self.model, "__cache__", None)
+        if cache is None:
+            return
+        key = self._cache_key()
+        if key is not None:
+            key = _invalidation_key(self.model, key[1:])
+        if self._batch:
+            # the rows change when the batch runs
+            _invalidate_with_batch(self._batch, cache, key)
+        else:
+            await _invalidate(cache, key)
 
 
 class AioBatchQuery(BatchQuery):
+    """
+    BatchQuery executed with ``await batch.async_execute()``.
+
+    Queued statements are sent as a driver BatchStatement, bound to
+    prepared statements when the session prepares statements. With
+    ``group_by_partition=True`` statements are grouped per partition,
+    and ``max_statements``/``max_bytes`` split the batch into smaller
+    batches; the resulting batches run concurrently, so the batch as a
+    whole is no longer atomic. A batch with a ``timestamp`` is sent as
+    CQL ``USING TIMESTAMP`` batches instead, split the same way.
+
+    Used as ``async with AioBatchQuery() as b:`` the batch is executed
+    when the block exits. Inside the block, ``flush_every`` statements
+    or ``flush_interval`` seconds flush the queued statements in the
+    background while more are added; errors of background flushes are
+    raised when the batch is executed.
+    """
+
+    def __init__(self, *args, group_by_partition=False, max_statements=None,
+                 max_bytes=None, flush_every=None, flush_interval=None,
+                 **kwargs):
+        super(AioBatchQuery, self).__init__(*args, **kwargs)
+        self.group_by_partition = group_by_partition
+        self.max_statements = max_statements
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._loop = None
+        self._flush_timer = None
+        self._flushes = set()
+        self._flush_errors = []
+        self._invalidations = []
+
+    async def __aenter__(self):
+        self._context_entered = True
+        self._loop = asyncio.get_event_loop()
+        if self.flush_interval:
+            self._flush_timer = self._loop.create_task(
+                self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._loop = None
+        if exc_type is not None and not self._execute_on_exception:
+            # let the flushes already sent finish, the error propagates
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+            await self._async_invalidate()
+            return
+        await self.async_execute()
+
+    def add_query(self, query):
+        super(AioBatchQuery, self).add_query(query)
+        if (self._loop is not None and self.flush_every
+                and len(self.queries) >= self.flush_every):
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        queries, self.queries = self.queries, []
+        task = self._loop.create_task(self._async_execute_queries(queries))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushed)
+
+    def _flushed(self, task):
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._flush_errors.append(task.exception())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.queries:
+                self._schedule_flush()
+
     async def async_execute(self):
         if self._executed and self.warn_multiple_exec:
             msg = "Batch executed multiple times."
@@ -398,12 +1987,139 @@ class AioBatchQuery(BatchQuery):
             warn(msg)
         self._executed = True
 
-        if len(self.queries) == 0:
+        try:
+            await self._async_execute_batch()
+        finally:
+            # the cached rows are stale once the batch returns, even
+            # partially applied
+            await self._async_invalidate()
+
+        self._execute_callbacks()
+
+    async def _async_invalidate(self):
+        invalidations, self._invalidations = self._invalidations, []
+        await asyncio.gather(
+            *[_invalidate(cache, key) for cache, key in invalidations])
+
+    async def _async_execute_batch(self):
+        if len(self.queries) == 0 and not self._flushes:
             # Empty batch is a no-op
             # except for callbacks
-            self._execute_callbacks()
+            self._raise_flush_errors()
             return
 
+        queries, self.queries = self.queries, []
+        try:
+            if queries:
+                await self._async_execute_queries(queries)
+        except Exception:
+            self.queries[:0] = queries
+            raise
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        self._raise_flush_errors()
+
+    def execute(self):
+        try:
+            super(AioBatchQuery, self).execute()
+        finally:
+            invalidations, self._invalidations = self._invalidations, []
+            for cache, key in invalidations:
+                _invalidate_soon(cache, key, self._connection)
+
+    def _raise_flush_errors(self):
+        if self._flush_errors:
+            errors, self._flush_errors = self._flush_errors, []
+            raise errors[0]
+
+    async def _async_execute_queries(self, queries):
+        if self.timestamp:
+            # a batch wide USING TIMESTAMP can't be set on a BatchStatement,
+            # every batch is sent as CQL carrying the timestamp
+            entries = []
+            for query in queries:
+                model = _model_for_table(query.table)
+                routing_key = (None if model is None else _routing_key(
+                    model, query, self._connection))
+                partition = (None if routing_key is None else
+                             (model._get_keyspace(), tuple(routing_key)))
+                entries.append((query, partition, _estimated_size(query,
+                                                                  None)))
+            await asyncio.gather(*[
+                self._async_execute_cql([query for query, _ in batch])
+                for batch in self._split(entries)
+            ])
+            return
+        batches = await self._batch_statements(queries)
+        results = await asyncio.gather(*[
+            execute(batch, timeout=self._timeout, connection=self._connection)
+            for batch in batches
+        ])
+        for result in results:
+            check_applied(result)
+
+    def _split(self, entries):
+        """
+        Splits ``(item, partition, size)`` entries into lists of
+        ``(item, partition)``, one per batch to send
+        """
+        groups = OrderedDict()
+        for entry in entries:
+            groups.setdefault(entry[1] if self.group_by_partition else None,
+                              []).append(entry)
+
+        batches = []
+        for group in groups.values():
+            batch, size = None, 0
+            for item, partition, item_size in group:
+                if batch is None or (
+                        self.max_statements
+                        and len(batch) >= self.max_statements) or (
+                            self.max_bytes
+                            and size + item_size > self.max_bytes):
+                    batch = []
+                    batches.append(batch)
+                    size = 0
+                batch.append((item, partition))
+                size += item_size
+        return batches
+
+    async def _batch_statements(self, queries):
+        """
+        Converts statements into one or more BatchStatement
+        """
+        connection = self._connection
+        batch_type = (getattr(BatchType, self.batch_type.upper())
+                      if self.batch_type else BatchType.LOGGED)
+        entries = []
+        for query in queries:
+            model = _model_for_table(query.table)
+            if model is not None:
+                statement, params = await _build_statement(
+                    model, query, None, connection)
+            else:
+                statement = SimpleStatement(str(query))
+                params = query.get_context()
+            entries.append(((statement, params),
+                            (statement.keyspace, statement.routing_key),
+                            _estimated_size(statement, params)))
+
+        session = conn.get_connection(connection).session
+        batches = []
+        for statements in self._split(entries):
+            batch = BatchStatement(batch_type,
+                                   consistency_level=self._consistency,
+                                   session=session)
+            for (statement, params), _ in statements:
+                batch.add(statement, params)
+            # the driver routes a batch to its first statement's partition,
+            # only worth it when that is the partition of every statement
+            if len({partition for _, partition in statements}) > 1:
+                batch.routing_key = None
+            batches.append(batch)
+        return batches
+
+    async def _async_execute_cql(self, queries):
         opener = ("BEGIN " +
                   (self.batch_type + " " if self.batch_type else "") +
                   " BATCH")
@@ -425,7 +2141,13 @@ class AioBatchQuery(BatchQuery):
         query_list = [opener]
         parameters = {}
         ctx_counter = 0
-        for query in self.queries:
+        partitions = set()
+        for query in queries:
+            model = _model_for_table(query.table)
+            routing_key = (None if model is None else _routing_key(
+                model, query, self._connection))
+            partitions.add(None if routing_key is None else
+                           (model._get_keyspace(), tuple(routing_key)))
             query.update_context_id(ctx_counter)
             ctx = query.get_context()
             ctx_counter += len(ctx)
@@ -434,14 +2156,17 @@ class AioBatchQuery(BatchQuery):
 
         query_list.append("APPLY BATCH;")
 
+        statement = SimpleStatement("\n".join(query_list),
+                                    consistency_level=self._consistency)
+        if len(partitions) == 1 and None not in partitions:
+            # every statement targets the same partition
+            statement.keyspace, routing_key = partitions.pop()
+            statement.routing_key = list(routing_key)
         tmp = await execute(
-            "\n".join(query_list),
+            statement,
             parameters,
             self._consistency,
             self._timeout,
             connection=self._connection,
         )
         check_applied(tmp)
-
-        self.queries = []
-        self._execute_callbacks()
@@ -0,0 +1,107 @@
+"""
+Compact, read-only rows of a model.
+"""
+from cassandra.cqlengine import columns
+
+_compact_classes = {}
+
+
+class CompactRow(object):
+    """
+    Read-only snapshot of a model row, see ``AioQuerySet.compact()``.
+
+    Column values are held in the slots of a class built once per model,
+    which also holds the model metadata. There is no value manager, nor
+    change tracking or per query state, per row. ``to_model()`` returns
+    an instance of the model to change and save the row.
+    """
+
+    __slots__ = ()
+    _model = None
+    _names = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "{0} rows are read-only, use to_model() to change them".format(
+                type(self).__name__))
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return _compact_row, (self._model, self._values())
+
+    def __getitem__(self, name):
+        if name not in self._model._columns:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{0}({1})".format(
+            type(self).__name__, ", ".join(
+                "{0}={1!r}".format(name, getattr(self, name))
+                for name in self._names))
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._names)
+
+    def _as_dict(self):
+        return dict(zip(self._names, self._values()))
+
+    def to_model(self):
+        """
+        Returns the row as a persisted model instance
+        """
+        model = self._model
+        return model._construct_instance(
+            dict((model._columns[name].db_field_name, value)
+                 for name, value in zip(self._names, self._values())))
+
+
+def _compact_class(model):
+    row_class = _compact_classes.get(model)
+    if row_class is None:
+        names = tuple(model._columns)
+        row_class = type(model.__name__ + "CompactRow", (CompactRow, ), {
+            "__slots__": names,
+            "_model": model,
+            "_names": names,
+        })
+        _compact_classes[model] = row_class
+    return row_class
+
+
+def _compact_row(model, values):
+    row_class = _compact_class(model)
+    row = object.__new__(row_class)
+    for name, value in zip(row_class._names, values):
+        getattr(row_class, name).__set__(row, value)
+    return row
+
+
+def _compact_constructor(model):
+    """
+    Returns a function building the compact row of a query result,
+    columns that were not selected are None
+    """
+    row_class = _compact_class(model)
+    fields = [(getattr(row_class, name).__set__, col.db_field_name,
+               col.to_python, isinstance(col, columns.BaseContainerColumn))
+              for name, col in model._columns.items()]
+    new = object.__new__
+
+    def construct(row):
+        instance = new(row_class)
+        get = row.get
+        for set_value, db_name, to_python, container in fields:
+            value = get(db_name)
+            if value is not None or container:
+                value = to_python(value)
+            set_value(instance, value)
+        return instance
+
+    return construct
@@ -0,0 +1,176 @@
+"""
+Bounded-concurrency scheduling for the wrapped session.
+"""
+import asyncio
+import time
+from collections import Counter, deque
+
+from cassandra.query import BatchStatement, BoundStatement, Statement
+
+
+async def _bounded_map(fn, items, concurrency):
+    """
+    Awaits ``fn(item)`` for every item with at most ``concurrency`` calls
+    running at a time, returns the results in the order of ``items``.
+    The first error cancels the calls still running and is raised.
+    """
+    _check_concurrency(concurrency)
+    items = list(items)
+    results = [None] * len(items)
+    # workers share one iterator, so at most `concurrency` calls
+    # run whatever the number of items
+    pending = iter(enumerate(items))
+
+    async def _worker():
+        for index, item in pending:
+            results[index] = await fn(item)
+
+    workers = [
+        asyncio.ensure_future(_worker())
+        for _ in range(min(concurrency, len(items)))
+    ]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for worker in workers:
+            worker.cancel()
+        raise
+    return results
+
+
+def _check_concurrency(concurrency):
+    if concurrency < 1:
+        raise ValueError(
+            "concurrency must be at least 1, got {0!r}".format(concurrency))
+
+
+def _is_read(query):
+    if isinstance(query, BatchStatement):
+        return False
+    if isinstance(query, BoundStatement):
+        query_string = query.prepared_statement.query_string
+    elif isinstance(query, Statement):
+        query_string = query.query_string
+    else:
+        query_string = query
+    return query_string.lstrip()[:6].upper() == "SELECT"
+
+
+class RequestScheduler(object):
+    """
+    Limits the number of requests in flight on a session.
+
+    Requests over ``max_in_flight`` wait in a FIFO queue, as well as
+    routed requests over ``max_in_flight_per_host`` for the replicas of
+    their partition, which a token aware policy sends them to. Requests
+    without a routing key are only bounded by ``max_in_flight``. With
+    ``prioritize_reads=True`` waiting reads are let through before
+    waiting writes.
+    """
+
+    def __init__(self,
+                 max_in_flight=1024,
+                 max_in_flight_per_host=None,
+                 prioritize_reads=False):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_host = max_in_flight_per_host
+        self.prioritize_reads = prioritize_reads
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.queued = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+        self._replicas_in_flight = Counter()
+        # reads, writes; only the first queue is used in FIFO mode
+        self._queues = (deque(), deque())
+
+    @property
+    def mean_wait_time(self):
+        return self.total_wait_time / self.queued if self.queued else 0.0
+
+    def _replicas(self, session, query):
+        # the load balancing policy is not asked, making a query plan
+        # moves its round robin position on
+        if self.max_in_flight_per_host is None:
+            return None
+        if not isinstance(query, Statement):
+            return None
+        routing_key = query.routing_key
+        if routing_key is None:
+            return None
+        keyspace = query.keyspace or session.keyspace
+        return frozenset(
+            session.cluster.metadata.get_replicas(keyspace,
+                                                  routing_key)) or None
+
+    def _has_capacity(self, replicas):
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return (replicas is None or self.max_in_flight_per_host is None
+                or self._replicas_in_flight[replicas] <
+                self.max_in_flight_per_host)
+
+    def _take(self, replicas):
+        self.in_flight += 1
+        if replicas is not None:
+            self._replicas_in_flight[replicas] += 1
+
+    async def acquire(self, session, query):
+        """
+        Waits for a free slot, returns the replicas to pass to release()
+        """
+        replicas = self._replicas(session, query)
+        if self.queue_depth == 0 and self._has_capacity(replicas):
+            self._take(replicas)
+            return replicas
+
+        queue = self._queues[0]
+        if self.prioritize_reads and not _is_read(query):
+            queue = self._queues[1]
+        future = session._asyncio_loop.create_future()
+        queue.append((replicas, future))
+        self.queue_depth += 1
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.queue_depth -= 1
+            else:
+                # the slot was granted before the cancellation landed
+                self.release(replicas)
+            raise
+        wait_time = time.monotonic() - start
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        return replicas
+
+    def release(self, replicas):
+        self.in_flight -= 1
+        if replicas is not None:
+            self._replicas_in_flight[replicas] -= 1
+            if not self._replicas_in_flight[replicas]:
+                del self._replicas_in_flight[replicas]
+        self._wake()
+
+    def _wake(self):
+        for queue in self._queues:
+            blocked = []
+            while queue and self.in_flight < self.max_in_flight:
+                replicas, future = queue.popleft()
+                if future.done():
+                    # cancelled while waiting
+                    continue
+                if not self._has_capacity(replicas):
+                    blocked.append((replicas, future))
+                    continue
+                self.queue_depth -= 1
+                self._take(replicas)
+                future.set_result(None)
+            queue.extendleft(reversed(blocked))
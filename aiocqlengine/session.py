@@ -1,8 +1,274 @@
 import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict, deque
 from functools import partial
 from types import MethodType
 
-from cassandra.cluster import ResultSet
+from cassandra import OperationTimedOut
+from cassandra.cluster import ResultSet, _NOT_SET
+
+from aiocqlengine.connection import loop_connection_class
+
+DEFAULT_PREPARED_CACHE_SIZE = 512
+
+_NAME = r'(?:"(?:[^"]|"")+"|\w+)'
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|INTO|UPDATE)\s+({0}(?:\s*\.\s*{0})?)'.format(_NAME),
+    re.IGNORECASE)
+
+
+def _parse_table(name):
+    """
+    Returns the (keyspace, table) of a possibly keyspace qualified table
+    name, the keyspace being None when not given. Quoted names keep their
+    case, unquoted ones are case insensitive like in CQL.
+    """
+    parts = [
+        part[1:-1].replace('""', '"') if part.startswith('"') else
+        part.lower() for part in re.findall(_NAME, name)
+    ]
+    return (None, parts[0]) if len(parts) == 1 else tuple(parts[-2:])
+
+
+def _statement_table(query_string):
+    """
+    Returns the (keyspace, table) a query string reads or writes, None if
+    it can't be told
+    """
+    match = _TABLE_RE.search(query_string)
+    return _parse_table(match.group(1)) if match else None
+
+
+class SingleFlight(object):
+    """
+    Shares one execution between concurrent identical requests: while a
+    request is in flight, requests with the same key wait for its result
+    instead of being sent.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.collapsed = 0
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def __contains__(self, key):
+        return key in self._in_flight
+
+    async def run(self, key, execute):
+        """
+        Returns the result of awaiting ``execute()``, or of the request
+        already in flight for ``key``
+        """
+        self.requests += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(execute())
+            future.add_done_callback(partial(self._done, key))
+        else:
+            self.collapsed += 1
+        # Shield the shared future so that one cancelled caller
+        # does not cancel the request for everybody else
+        return await asyncio.shield(future)
+
+    def forget(self, key=None):
+        """
+        Lets the next requests for ``key``, or for any key, start a new
+        execution. The executions in flight still complete for their
+        callers.
+        """
+        if key is None:
+            self._in_flight.clear()
+        else:
+            self._in_flight.pop(key, None)
+
+    def is_current(self, key):
+        """
+        Whether the execution calling it is the one shared for ``key``,
+        i.e. it was not forgotten since it started
+        """
+        return self._in_flight.get(key) is asyncio.current_task()
+
+    def _done(self, key, future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+
+class PreparedStatementCache(object):
+    """
+    Bounded LRU of prepared statements, keyed on the rendered query string
+    and recording the table each statement targets.
+
+    A query string is prepared once, in the loop's default executor so
+    the event loop is never blocked, and concurrent misses on the same
+    query string share a single preparation.
+    """
+
+    def __init__(self, session, maxsize=DEFAULT_PREPARED_CACHE_SIZE):
+        self._session = session
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._statements = OrderedDict()
+        self._preparing = SingleFlight()
+
+    def __len__(self):
+        return len(self._statements)
+
+    def __contains__(self, query_string):
+        return query_string in self._statements
+
+    async def get(self, query_string):
+        entry = self._statements.get(query_string)
+        if entry is not None:
+            self._statements.move_to_end(query_string)
+            self.hits += 1
+            return entry[0]
+
+        if query_string in self._preparing:
+            self.hits += 1
+        return await self._preparing.run(
+            query_string, partial(self._prepare, query_string))
+
+    async def _prepare(self, query_string):
+        self.misses += 1
+        prepared = await self._session._asyncio_loop.run_in_executor(
+            None, self._session.prepare, query_string)
+        self._statements[query_string] = (prepared,
+                                          _statement_table(query_string))
+        while len(self._statements) > self.maxsize:
+            self._statements.popitem(last=False)
+        return prepared
+
+    def invalidate(self, query_string=None, table=None):
+        """
+        Drops cached statements. With no arguments the whole cache is
+        cleared, otherwise only ``query_string`` or the statements of
+        ``table`` (e.g. after a schema change) are dropped. ``table`` may
+        be qualified by its keyspace, ``"ks.users"``, otherwise the
+        statements of the table in any keyspace are dropped.
+        """
+        if query_string is None and table is None:
+            self._statements.clear()
+            return
+        if query_string is not None:
+            self._statements.pop(query_string, None)
+        if table is not None:
+            keyspace, name = _parse_table(table)
+            for key, (_, target) in list(self._statements.items()):
+                if target is None or target[1] != name:
+                    continue
+                if (keyspace is None or target[0] is None
+                        or target[0] == keyspace):
+                    del self._statements[key]
+
+
+class RoutingStats(object):
+    """
+    Counts the requests sent through ``execute_future`` and how many of
+    them carried a routing key, letting a token aware load balancing
+    policy send them straight to a replica.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.token_aware = 0
+
+    @property
+    def token_aware_fraction(self):
+        return self.token_aware / self.requests if self.requests else 0.0
+
+    def record(self, query):
+        self.requests += 1
+        if getattr(query, "routing_key", None) is not None:
+            self.token_aware += 1
+
+
+class CoalescedDelivery(object):
+    """
+    Hands results completed on the driver's I/O thread over to the event
+    loop, waking the loop once per batch of completions instead of once
+    per result.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._completed = deque()
+        self._scheduled = False
+        self.wakeups = 0
+        self.delivered = 0
+
+    def set_result(self, future, result):
+        self._completed.append((future, result, None))
+        self._wake()
+
+    def set_exception(self, future, exc):
+        self._completed.append((future, None, exc))
+        self._wake()
+
+    def _wake(self):
+        # Racing I/O threads may both see no drain scheduled and wake
+        # the loop twice, which is harmless: the second drain finds the
+        # buffer empty. A completion appended after the flag is reset is
+        # always followed by a new wakeup.
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        self._scheduled = False
+        self.wakeups += 1
+        completed = self._completed
+        while completed:
+            future, result, exc = completed.popleft()
+            if future.cancelled():
+                continue
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+            self.delivered += 1
+
+
+def _set_result(future, result):
+    # the future may have been cancelled since the callback was scheduled
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _abandon(cassandra_fut):
+    if cassandra_fut._event.is_set():
+        return
+    cassandra_fut._cancel_timer()
+    cassandra_fut._on_timeout()
+
+
+def _cancel_request(self, cassandra_fut):
+    """
+    Abandons a driver request. The native protocol cannot cancel a
+    request, so it is dropped the way the driver drops a request timing
+    out on the client: its stream id is released once the late response
+    arrives, and no retry or speculative execution is sent anymore.
+    """
+    if cassandra_fut._event.is_set():
+        return
+    if threading.get_ident() == self._asyncio_loop_thread:
+        # the connection I/O runs on the loop, no need to hop threads
+        _abandon(cassandra_fut)
+    else:
+        # the connection's requests and stream ids belong to the I/O
+        # thread, the timeout is run there like a client side timeout
+        self.cluster.connection_class.create_timer(
+            0, partial(_abandon, cassandra_fut))
 
 
 def _asyncio_result(self, async_fut, cassandra_fut, result):
@@ -13,32 +279,153 @@ def _asyncio_result(self, async_fut, cassandra_fut, result):
         return
 
     result_set = ResultSet(cassandra_fut, result)
-    self._asyncio_loop.call_soon_threadsafe(async_fut.set_result,
-                                            result_set)
+    if threading.get_ident() == self._asyncio_loop_thread:
+        # the connection I/O runs on the loop, no need to hop threads
+        async_fut.set_result(result_set)
+    elif self.result_delivery is not None:
+        self.result_delivery.set_result(async_fut, result_set)
+    else:
+        self._asyncio_loop.call_soon_threadsafe(_set_result, async_fut,
+                                                result_set)
 
 
 def _asyncio_exception(self, fut, exc):
     if fut.cancelled():
         return
-    self._asyncio_loop.call_soon_threadsafe(fut.set_exception, exc)
+    if threading.get_ident() == self._asyncio_loop_thread:
+        fut.set_exception(exc)
+    elif self.result_delivery is not None:
+        self.result_delivery.set_exception(fut, exc)
+    else:
+        self._asyncio_loop.call_soon_threadsafe(_set_exception, fut, exc)
 
 
-async def execute_future(self, *args, **kwargs):
-    cassandra_fut = self.execute_async(*args, **kwargs)
-    future = asyncio.Future(loop=self._asyncio_loop)
-    cassandra_fut.add_callbacks(
-        callback=partial(self._asyncio_result, future, cassandra_fut),
-        errback=partial(self._asyncio_exception, future)
-    )
+async def _execute_future(self, *args, labels=None, **kwargs):
+    metrics = self.metrics if labels is not None else None
+    scheduler = self.request_scheduler
+    queue_wait = None
+    if scheduler is not None:
+        start = time.monotonic()
+        replicas = await scheduler.acquire(self, args[0] if args else
+                                           kwargs.get("query"))
+        queue_wait = time.monotonic() - start
+    try:
+        self.routing.record(args[0] if args else kwargs.get("query"))
+        sent = time.monotonic()
+        cassandra_fut = self.execute_async(*args, **kwargs)
+        future = asyncio.Future(loop=self._asyncio_loop)
+        cassandra_fut.add_callbacks(
+            callback=partial(self._asyncio_result, future, cassandra_fut),
+            errback=partial(self._asyncio_exception, future)
+        )
 
-    return await future
+        try:
+            return await future
+        except asyncio.CancelledError:
+            _cancel_request(self, cassandra_fut)
+            raise
+        finally:
+            if metrics is not None and not future.cancelled():
+                metrics.observe_timings(labels, queue_wait,
+                                        time.monotonic() - sent)
+    finally:
+        if scheduler is not None:
+            scheduler.release(replicas)
 
 
-def aiosession_for_cqlengine(session, *, loop=None):
+async def execute_future(self, *args, deadline=None, **kwargs):
+    """
+    Executes a query like ``execute_async``, returns its ResultSet.
+
+    ``deadline`` is a :func:`time.monotonic` time by which the request
+    must have completed, including any wait for the request scheduler,
+    otherwise ``OperationTimedOut`` is raised and the request abandoned.
+    Cancelling the awaiting task abandons the request as well.
+    """
+    if deadline is None:
+        return await _execute_future(self, *args, **kwargs)
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise OperationTimedOut(
+            {"deadline": "Deadline passed before the request was sent"})
+    timeout = kwargs.get("timeout", _NOT_SET)
+    if timeout is _NOT_SET or timeout is None or timeout > remaining:
+        kwargs["timeout"] = remaining
+    try:
+        return await asyncio.wait_for(_execute_future(self, *args, **kwargs),
+                                      remaining)
+    except asyncio.TimeoutError:
+        raise OperationTimedOut({"deadline": "Deadline exceeded"})
+
+
+def aiosession_for_cqlengine(session, *, loop=None, prepare_statements=False,
+                             prepared_cache_size=DEFAULT_PREPARED_CACHE_SIZE,
+                             request_scheduler=None, coalesce_results=False,
+                             single_flight_reads=False, metrics=None):
+    """
+    Wrap a driver session for aiocqlengine.
+
+    With ``prepare_statements=True`` cqlengine statements are prepared
+    once per rendered query string and executed as bound statements
+    instead of inlining their parameters on every call.
+
+    A :class:`~aiocqlengine.scheduler.RequestScheduler` passed as
+    ``request_scheduler`` bounds the requests in flight through
+    ``execute_future``.
+
+    With ``coalesce_results=True`` responses completed on the driver's
+    I/O thread are buffered and delivered to the loop in batches, see
+    :class:`CoalescedDelivery`.
+
+    With ``single_flight_reads=True`` identical queryset selects in
+    flight at the same time share a single request, see
+    :class:`SingleFlight`.
+
+    A :class:`~aiocqlengine.metrics.MetricsRegistry` passed as
+    ``metrics`` records the requests executed through aiocqlengine.
+
+    ``session.routing`` is a :class:`RoutingStats` counting the requests
+    that were token aware.
+    """
     if loop is None:
         loop = asyncio.get_event_loop()
     session._asyncio_loop = loop
+    session._asyncio_loop_thread = None
     session._asyncio_exception = MethodType(_asyncio_exception, session)
     session._asyncio_result = MethodType(_asyncio_result, session)
     session.execute_future = MethodType(execute_future, session)
+    session.prepared_statement_cache = (PreparedStatementCache(
+        session, maxsize=prepared_cache_size) if prepare_statements else None)
+    session.request_scheduler = request_scheduler
+    session.result_delivery = (CoalescedDelivery(loop)
+                               if coalesce_results else None)
+    session.single_flight = SingleFlight() if single_flight_reads else None
+    session.metrics = metrics
+    session.routing = RoutingStats()
+    return session
+
+
+async def connect_aiosession(cluster, keyspace=None, **kwargs):
+    """
+    Connect ``cluster`` with its connections doing their I/O on the
+    running event loop, and wrap the session for aiocqlengine.
+
+    Driver responses are then delivered to the awaiting coroutines
+    without crossing threads. Keyword arguments are passed on to
+    :func:`aiosession_for_cqlengine`.
+
+    The cluster must not be connected yet, and blocking driver calls
+    (including the synchronous cqlengine API) must not be made from the
+    loop thread afterwards, see
+    :class:`~aiocqlengine.connection.AioLoopConnection`.
+    """
+    if cluster._is_setup:
+        raise RuntimeError("The cluster is already connected")
+    loop = asyncio.get_event_loop()
+    cluster.connection_class = loop_connection_class(loop)
+    # connecting waits on responses read by the loop
+    session = await loop.run_in_executor(None, cluster.connect, keyspace)
+    aiosession_for_cqlengine(session, loop=loop, **kwargs)
+    session._asyncio_loop_thread = threading.get_ident()
     return session
@@ -0,0 +1,179 @@
+"""
+Write-behind buffering of updates to hot rows.
+"""
+import asyncio
+import weakref
+from collections import OrderedDict
+
+from aiocqlengine.scheduler import _bounded_map, _check_concurrency
+
+DEFAULT_FLUSH_INTERVAL = 0.1
+DEFAULT_MAX_ROWS = 1000
+
+_buffers = weakref.WeakSet()
+
+
+class WriteBehindBuffer(object):
+    """
+    Buffers the updates of a model's rows and merges the ones pending for
+    the same primary key, enabled by setting it as the model's
+    ``__write_behind__``:
+
+    .. code-block:: python
+
+        class Presence(AioModel):
+            __write_behind__ = WriteBehindBuffer(interval=0.1)
+
+    ``async_update`` of a queryset on a full primary key, or of an
+    instance, returns once the update is buffered when it only sets
+    non null values of scalar columns, without ttl, timestamp, conditions
+    or batch. The pending rows are written as one update each after
+    ``interval`` seconds, or as soon as ``max_rows`` rows are pending,
+    with at most ``concurrency`` requests in flight, the updates of a row
+    in the order they were flushed. Any other write of a row with the
+    async methods, batched or not, first writes its pending update; the
+    synchronous methods don't.
+
+    This trades durability and read-your-writes for fewer requests:
+
+    - updates still pending are lost if the process dies before they
+      are flushed, ``await flush()`` or ``await close()`` them before
+      shutting down, or ``await drain()`` every buffer;
+    - reads, through the model cache or not, only see an update once it
+      has been flushed;
+    - errors of flushed updates can't be raised to the callers that
+      buffered them, they are counted in ``errors`` and the first one is
+      raised by the next ``flush()``.
+    """
+
+    def __init__(self, interval=DEFAULT_FLUSH_INTERVAL,
+                 max_rows=DEFAULT_MAX_ROWS, concurrency=32):
+        _check_concurrency(concurrency)
+        self.interval = interval
+        self.max_rows = max_rows
+        self.concurrency = concurrency
+        self.closed = False
+        self.writes = 0
+        self.coalesced = 0
+        self.flushed = 0
+        self.errors = 0
+        self._pending = OrderedDict()
+        self._handle = None
+        self._flushing = set()
+        self._writing = {}
+        self._flush_errors = []
+        _buffers.add(self)
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, key, values, write):
+        """
+        Merges ``values`` into the pending update of ``key``, written by
+        awaiting ``write(values)``. Waits for a flush when the buffer is
+        full.
+        """
+        self.writes += 1
+        entry = self._pending.get(key)
+        if entry is not None:
+            self.coalesced += 1
+            entry[0].update(values)
+            entry[1] = write
+            return
+        self._pending[key] = [dict(values), write]
+        if len(self._pending) >= self.max_rows:
+            await self._flush_pending()
+        elif self._handle is None:
+            self._handle = asyncio.get_event_loop().call_later(
+                self.interval, self._flush_pending)
+
+    async def flush(self, key=None):
+        """
+        Writes the pending updates, or only the one of ``key``, and waits
+        for the writes in flight. Without ``key`` the first error of the
+        updates flushed since the last ``flush()`` is raised.
+        """
+        await self._settle(key)
+        if key is None and self._flush_errors:
+            errors, self._flush_errors = self._flush_errors, []
+            raise errors[0]
+
+    async def close(self):
+        """
+        Flushes the pending updates, later updates are not buffered
+        anymore
+        """
+        self.closed = True
+        await self.flush()
+
+    async def _settle(self, key=None):
+        if key is None:
+            self._flush_pending()
+        else:
+            entry = self._pending.pop(key, None)
+            if entry is not None:
+                self._start([(key, entry)])
+        if self._flushing:
+            await asyncio.gather(*list(self._flushing))
+
+    def _flush_pending(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._pending:
+            return None
+        entries, self._pending = list(self._pending.items()), OrderedDict()
+        return self._start(entries)
+
+    def _start(self, entries):
+        loop = asyncio.get_event_loop()
+        rows = []
+        for key, (values, write) in entries:
+            # a row's update is sent once its previous one has completed,
+            # so that an older value can't overwrite a newer one
+            previous = self._writing.get(key)
+            done = self._writing[key] = loop.create_future()
+            rows.append((key, values, write, previous, done))
+        task = asyncio.ensure_future(self._write(rows))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+        return task
+
+    async def _write(self, rows):
+        try:
+            await _bounded_map(self._write_row, rows, self.concurrency)
+        finally:
+            for key, _, _, _, done in rows:
+                self._written(key, done)
+
+    async def _write_row(self, row):
+        key, values, write, previous, done = row
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            self.flushed += 1
+            await write(values)
+        except Exception as exc:
+            self.errors += 1
+            self._flush_errors.append(exc)
+        finally:
+            self._written(key, done)
+
+    def _written(self, key, done):
+        if not done.done():
+            done.set_result(None)
+        if self._writing.get(key) is done:
+            del self._writing[key]
+
+
+async def drain():
+    """
+    Closes every write-behind buffer, for a graceful shutdown, then
+    raises the first flush error if any
+    """
+    results = await asyncio.gather(
+        *[buffer.close() for buffer in list(_buffers)],
+        return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
@@ -0,0 +1,95 @@
+"""
+Per-call CPU of async_create and async_update, with and without the
+compiled statement cache, on the in-process fake session of
+fake_session.py. No cluster is needed.
+"""
+import asyncio
+import uuid
+from itertools import count
+from time import process_time
+
+from aiocqlengine.models import AioModel
+from aiocqlengine.query import AioDMLQuery
+from aiocqlengine.session import aiosession_for_cqlengine
+from cassandra.cqlengine import columns
+
+from fake_session import FakeSession, register
+
+CALLS = 20000
+
+
+class UncompiledDMLQuery(AioDMLQuery):
+    """
+    Builds the statements of every call, as batched or timestamped
+    writes do
+    """
+
+    def _can_compile(self):
+        return False
+
+
+class User(AioModel):
+    __keyspace__ = 'example'
+    user_id = columns.UUID(primary_key=True)
+    username = columns.Text()
+    email = columns.Text()
+    age = columns.Integer()
+
+
+class UncompiledUser(User):
+    __dmlquery__ = UncompiledDMLQuery
+
+
+def create(model):
+
+    async def call():
+        await model.async_create(user_id=uuid.uuid4(),
+                                 username='user',
+                                 email='user@example.com',
+                                 age=42)
+
+    return call
+
+
+def update(model):
+    user = model(user_id=uuid.uuid4(), username='user')
+    user._set_persisted()
+    # a changed value, updating an unchanged instance sends nothing
+    ages = count()
+
+    async def call():
+        await user.async_update(age=next(ages))
+
+    return call
+
+
+async def run(call):
+    for _ in range(100):
+        await call()
+    start = process_time()
+    for _ in range(CALLS):
+        await call()
+    return (process_time() - start) / CALLS * 1e6
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    session = FakeSession()
+    register(session)
+    aiosession_for_cqlengine(session, loop=loop)
+    try:
+        for name, operation in (('async_create', create),
+                                ('async_update', update)):
+            statement = loop.run_until_complete(
+                run(operation(UncompiledUser)))
+            compiled = loop.run_until_complete(run(operation(User)))
+            print(f'{name}:')
+            print(f'  Statements: {statement:.2f} us/call')
+            print(f'  Compiled:   {compiled:.2f} us/call')
+            print(f'  Reduction:  {(1 - compiled / statement) * 100:.0f}%')
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Loop wakeups and latency of handing driver results to the event loop,
+one call_soon_threadsafe per result versus coalesced delivery. A thread
+stands in for the driver's I/O thread and completes the requests in
+bursts, no cluster is needed.
+"""
+import asyncio
+import queue
+import threading
+from time import perf_counter
+
+from aiocqlengine.session import aiosession_for_cqlengine
+
+REQUESTS = 20000
+CONCURRENCY = 2000
+BURST = 200
+
+
+class ResponseFuture(object):
+    _col_names = None
+    _col_types = None
+    has_more_pages = False
+
+    def __init__(self, io_queue):
+        self._io_queue = io_queue
+
+    def add_callbacks(self, callback, errback):
+        self._io_queue.put(callback)
+
+
+class Session(object):
+    def __init__(self):
+        self.io_queue = queue.Queue()
+        threading.Thread(target=self._io_loop, daemon=True).start()
+
+    def execute_async(self, *args, **kwargs):
+        return ResponseFuture(self.io_queue)
+
+    def _io_loop(self):
+        while True:
+            # complete whatever is pending, up to one read's worth
+            callbacks = [self.io_queue.get()]
+            while len(callbacks) < BURST and not self.io_queue.empty():
+                callbacks.append(self.io_queue.get())
+            for callback in callbacks:
+                callback([])
+
+
+async def run(coalesce_results):
+    loop = asyncio.get_event_loop()
+    wakeups = 0
+    call_soon_threadsafe = loop.call_soon_threadsafe
+
+    def counting_call_soon_threadsafe(*args):
+        nonlocal wakeups
+        wakeups += 1
+        return call_soon_threadsafe(*args)
+
+    loop.call_soon_threadsafe = counting_call_soon_threadsafe
+    session = aiosession_for_cqlengine(Session(),
+                                       loop=loop,
+                                       coalesce_results=coalesce_results)
+    latencies = []
+    remaining = iter(range(REQUESTS))
+
+    async def worker():
+        for _ in remaining:
+            start = perf_counter()
+            await session.execute_future('SELECT')
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    elapsed = perf_counter() - start
+    del loop.call_soon_threadsafe
+    latencies.sort()
+    return (wakeups, latencies[int(len(latencies) * 0.99)] * 1e3,
+            REQUESTS / elapsed)
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    try:
+        for name, coalesce_results in (('Per result', False),
+                                       ('Coalesced', True)):
+            wakeups, p99, rate = loop.run_until_complete(
+                run(coalesce_results))
+            print(f'{name}: {wakeups} wakeups, p99 {p99:.2f} ms, '
+                  f'{rate:.0f} requests/s')
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
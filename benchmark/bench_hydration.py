@@ -0,0 +1,73 @@
+"""
+Per-row CPU and memory of building model instances from wide rows, of
+which only two columns are read, eagerly and with lazy hydration. No
+cluster is needed.
+"""
+import tracemalloc
+import uuid
+from time import process_time
+
+from aiocqlengine.models import AioModel
+from cassandra.cqlengine import columns
+
+ROWS = 20000
+WIDTH = 30
+
+
+attrs = {
+    '__keyspace__': 'example',
+    'event_id': columns.UUID(primary_key=True),
+    'kind': columns.Text(),
+    'payload': columns.Blob(),
+    'tags': columns.List(columns.Text()),
+    'attributes': columns.Map(columns.Text(), columns.Text()),
+}
+for i in range(WIDTH):
+    attrs['c{0}'.format(i)] = columns.Text()
+Event = type('Event', (AioModel, ), attrs)
+
+
+def rows():
+    row = {
+        'event_id': uuid.uuid4(),
+        'kind': 'click',
+        'payload': b'x' * 1024,
+        'tags': ['tag{0}'.format(i) for i in range(20)],
+        'attributes': {'key{0}'.format(i): 'value' for i in range(20)},
+    }
+    for i in range(WIDTH):
+        row['c{0}'.format(i)] = 'value {0}'.format(i)
+    return [dict(row) for _ in range(ROWS)]
+
+
+def build(construct, data):
+    instances = [construct(row) for row in data]
+    for instance in instances:
+        instance.event_id, instance.kind
+    return instances
+
+
+def run(construct):
+    data = rows()
+    start = process_time()
+    build(construct, data)
+    elapsed = process_time() - start
+
+    # the rows are traced too, lazy instances keep them
+    tracemalloc.start()
+    instances = build(construct, rows())
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return elapsed / ROWS * 1e6, size / ROWS
+
+
+def main():
+    for name, construct in (('Eager', Event._construct_instance),
+                            ('Lazy', Event._construct_lazy)):
+        cpu, size = run(construct)
+        print(f'{name}: {cpu:.1f} us/row, {size:.0f} bytes/row')
+
+
+if __name__ == '__main__':
+    main()
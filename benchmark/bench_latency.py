@@ -0,0 +1,62 @@
+"""
+Per-request latency of sequential requests, with the driver's I/O in
+its own thread and with the connections on the application's loop.
+Needs a Cassandra node on localhost.
+"""
+import asyncio
+from time import perf_counter
+
+from aiocqlengine.session import aiosession_for_cqlengine, connect_aiosession
+from cassandra.cluster import Cluster
+
+REQUESTS = 10000
+QUERY = 'SELECT release_version FROM system.local'
+
+
+async def measure(session):
+    # warm up the connections and the loop
+    for _ in range(100):
+        await session.execute_future(QUERY)
+
+    latencies = []
+    for _ in range(REQUESTS):
+        start = perf_counter()
+        await session.execute_future(QUERY)
+        latencies.append(perf_counter() - start)
+    latencies.sort()
+    return [
+        latencies[int(len(latencies) * q)] * 1e6 for q in (0.5, 0.9, 0.99)
+    ]
+
+
+async def threaded():
+    cluster = Cluster()
+    session = aiosession_for_cqlengine(cluster.connect())
+    try:
+        return await measure(session)
+    finally:
+        cluster.shutdown()
+
+
+async def on_loop():
+    cluster = Cluster()
+    session = await connect_aiosession(cluster)
+    try:
+        return await measure(session)
+    finally:
+        await asyncio.get_event_loop().run_in_executor(None, cluster.shutdown)
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    try:
+        for name, run in (('I/O thread', threaded), ('Event loop', on_loop)):
+            p50, p90, p99 = loop.run_until_complete(run())
+            print(f'{name}: p50 {p50:.0f} us, p90 {p90:.0f} us, '
+                  f'p99 {p99:.0f} us')
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Memory per row and construction time of a large query result held in
+memory, as model instances, lazily hydrated instances, compact rows,
+named tuples and the driver's dicts. No cluster is needed.
+"""
+import tracemalloc
+import uuid
+from datetime import datetime
+from time import process_time
+
+from aiocqlengine.models import AioModel
+from cassandra.cqlengine import columns
+
+ROWS = 20000
+
+
+class Order(AioModel):
+    __keyspace__ = 'example'
+    order_id = columns.UUID(primary_key=True)
+    customer_id = columns.UUID()
+    status = columns.Text()
+    quantity = columns.Integer()
+    price = columns.Double()
+    currency = columns.Text()
+    created_at = columns.DateTime()
+    updated_at = columns.DateTime()
+    note = columns.Text()
+    tags = columns.Set(columns.Text())
+
+
+def rows():
+    now = datetime.utcnow()
+    return [{
+        'order_id': uuid.uuid4(),
+        'customer_id': uuid.uuid4(),
+        'status': 'shipped',
+        'quantity': i % 10,
+        'price': 9.99,
+        'currency': 'EUR',
+        'created_at': now,
+        'updated_at': now,
+        'note': None,
+        'tags': {'gift'},
+    } for i in range(ROWS)]
+
+
+def measure(queryset):
+    construct = queryset._get_result_constructor()
+    data = rows()
+    start = process_time()
+    [construct(row) for row in data]
+    elapsed = process_time() - start
+
+    # the rows are traced too, as some representations keep them
+    tracemalloc.start()
+    results = [construct(row) for row in rows()]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return elapsed / ROWS * 1e6, size / ROWS
+
+
+def main():
+    for name, queryset in (
+        ('Instances', Order.objects.all()),
+        ('Lazy instances', Order.objects.lazy()),
+        ('Compact rows', Order.objects.compact()),
+        ('Named tuples', Order.objects.as_tuples()),
+        ('Dicts', Order.objects.as_dicts()),
+    ):
+        cpu, size = measure(queryset)
+        print(f'{name}: {cpu:.2f} us/row, {size:.0f} bytes/row')
+
+
+if __name__ == '__main__':
+    main()
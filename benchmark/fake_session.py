@@ -0,0 +1,160 @@
+"""
+An in-process stand-in for a driver Session, completing requests from
+its own I/O thread like the driver does, so that the async and the sync
+cqlengine paths can be benchmarked without a cluster.
+
+Writes return no rows. Selects with a WHERE clause return ``row``,
+selects without one return ``table_rows`` copies of ``row``, paged by
+the statement's fetch size.
+"""
+import queue
+import threading
+
+from cassandra import OperationTimedOut
+from cassandra.cluster import ResultSet, _ConfigMode
+from cassandra.cqlengine import connection
+from cassandra.encoder import Encoder
+from cassandra.query import (FETCH_SIZE_UNSET, SimpleStatement, bind_params,
+                             dict_factory)
+
+
+class FakeCluster(object):
+    _config_mode = _ConfigMode.LEGACY
+    protocol_version = 4
+    metadata = None
+
+
+class FakeResponseFuture(object):
+    _col_names = None
+    _col_types = None
+    _continuous_paging_session = None
+
+    def __init__(self, session, query, fetch_size, paging_state):
+        self.session = session
+        self.query = query
+        self.row_factory = session.row_factory
+        self._fetch_size = fetch_size
+        self._start = paging_state
+        self._paging_state = None
+        self._final_result = None
+        self._final_exception = None
+        self._callbacks = []
+        self._errbacks = []
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    @property
+    def has_more_pages(self):
+        return self._paging_state is not None
+
+    def _complete(self):
+        rows, self._paging_state = self.session.rows(self.query,
+                                                     self._fetch_size,
+                                                     self._start)
+        with self._lock:
+            if self._event.is_set():
+                # timed out meanwhile
+                return
+            self._final_result = rows
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(rows)
+
+    def _cancel_timer(self):
+        pass
+
+    def _on_timeout(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._final_exception = OperationTimedOut()
+            self._event.set()
+            errbacks, self._errbacks = self._errbacks, []
+        for errback in errbacks:
+            errback(self._final_exception)
+
+    def add_callbacks(self, callback, errback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                self._errbacks.append(errback)
+                return
+        if self._final_exception is not None:
+            errback(self._final_exception)
+        else:
+            callback(self._final_result)
+
+    def result(self):
+        self._event.wait()
+        if self._final_exception is not None:
+            raise self._final_exception
+        return ResultSet(self, self._final_result)
+
+    def start_fetching_next_page(self):
+        self._start, self._paging_state = self._paging_state, None
+        self._final_result = None
+        self._event.clear()
+        self.session.io_queue.put(self)
+
+
+class FakeSession(object):
+    hosts = ()
+    keyspace = None
+    default_fetch_size = 5000
+
+    def __init__(self, row=None, table_rows=100):
+        self.cluster = FakeCluster()
+        self.encoder = Encoder()
+        self.row_factory = dict_factory
+        self.row = row or {}
+        self.table_rows = table_rows
+        self.requests = 0
+        self.io_queue = queue.Queue()
+        threading.Thread(target=self._io_loop, daemon=True).start()
+
+    def execute_async(self, query, parameters=None, timeout=None,
+                      paging_state=None, **kwargs):
+        if isinstance(query, str):
+            query = SimpleStatement(query)
+        if isinstance(query, SimpleStatement) and parameters:
+            # encode the parameters like the driver does before sending
+            bind_params(query.query_string, parameters, self.encoder)
+        fetch_size = getattr(query, 'fetch_size', None)
+        if fetch_size is FETCH_SIZE_UNSET:
+            fetch_size = self.default_fetch_size
+        future = FakeResponseFuture(self, query, fetch_size, paging_state)
+        self.requests += 1
+        self.io_queue.put(future)
+        return future
+
+    def execute(self, query, parameters=None, timeout=None, **kwargs):
+        return self.execute_async(query, parameters, timeout,
+                                  **kwargs).result()
+
+    def rows(self, query, fetch_size, paging_state):
+        """
+        Returns the rows of a page of ``query`` and the paging state of
+        the next page, or None
+        """
+        query_string = getattr(query, 'query_string', '')
+        if not query_string.lstrip().upper().startswith('SELECT'):
+            return [], None
+        if ' WHERE ' in query_string.upper():
+            return [dict(self.row)], None
+        start = int(paging_state or 0)
+        end = (min(start + fetch_size, self.table_rows)
+               if fetch_size else self.table_rows)
+        rows = [dict(self.row) for _ in range(start, end)]
+        return rows, (str(end).encode() if end < self.table_rows else None)
+
+    def _io_loop(self):
+        while True:
+            self.io_queue.get()._complete()
+
+
+def register(session, name='benchmark'):
+    """
+    Registers ``session`` as the default cqlengine connection
+    """
+    connection.register_connection(name, session=session, default=True)
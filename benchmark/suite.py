@@ -0,0 +1,285 @@
+"""
+Benchmark suite of the model operations, async aiocqlengine against the
+sync cqlengine baseline, on an in-process fake session: see
+fake_session.py, no cluster is needed.
+
+Every scenario (operation, concurrency, row width, page size) is run
+with both, reporting ops/s, p50/p99 latency and the peak of the memory
+allocated, measured in a separate pass under tracemalloc. Absolute
+numbers depend on the machine, so runs are compared on the ratio of
+async to sync ops/s:
+
+    python benchmark/suite.py --json baseline.json
+    python benchmark/suite.py --compare baseline.json
+
+exits with status 1 when a scenario's ratio regressed by more than
+``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count, product
+from time import perf_counter
+
+from aiocqlengine.models import AioModel
+from aiocqlengine.query import AioBatchQuery
+from aiocqlengine.session import aiosession_for_cqlengine
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+from cassandra.cqlengine.query import BatchQuery
+
+from fake_session import FakeSession, register
+
+OPERATIONS = ('create', 'save', 'update', 'delete', 'get', 'batch',
+              'iterate')
+BATCH_SIZE = 10
+TABLE_ROWS = 1000
+
+
+def build_models(width):
+    """
+    Returns the sync and the async model of a table with ``width``
+    text columns
+    """
+    models = []
+    for base, name in ((Model, 'SyncRow'), (AioModel, 'AioRow')):
+        attrs = {
+            '__keyspace__': 'benchmark',
+            '__table_name__': '{0}_{1}'.format(name.lower(), width),
+            'id': columns.UUID(primary_key=True),
+        }
+        for i in range(width):
+            attrs['c{0}'.format(i)] = columns.Text()
+        models.append(type('{0}{1}'.format(name, width), (base, ), attrs))
+    return models
+
+
+def row_values(width):
+    values = {'id': uuid.uuid4()}
+    for i in range(width):
+        values['c{0}'.format(i)] = 'value {0}'.format(i)
+    return values
+
+
+def sync_operation(name, model, values, page_size):
+    if name == 'create':
+        return lambda: model.create(**values)
+    if name == 'save':
+        instance = model(**values)
+        instance._set_persisted()
+        # a changed value, saving an unchanged instance sends nothing
+        saves = count()
+
+        def save():
+            instance.c0 = 'saved {0}'.format(next(saves))
+            instance.save()
+
+        return save
+    if name == 'update':
+        return lambda: model.objects(id=values['id']).update(c0='updated')
+    if name == 'delete':
+        instance = model(**values)
+        return instance.delete
+    if name == 'get':
+        return lambda: model.get(id=values['id'])
+    if name == 'batch':
+
+        def batch():
+            with BatchQuery() as b:
+                for _ in range(BATCH_SIZE):
+                    model.batch(b).create(**values)
+
+        return batch
+    if name == 'iterate':
+        return lambda: sum(1 for _ in model.objects.fetch_size(page_size))
+    raise ValueError(name)
+
+
+def async_operation(name, model, values, page_size):
+    if name == 'create':
+        return lambda: model.async_create(**values)
+    if name == 'save':
+        instance = model(**values)
+        instance._set_persisted()
+        saves = count()
+
+        async def save():
+            instance.c0 = 'saved {0}'.format(next(saves))
+            await instance.async_save()
+
+        return save
+    if name == 'update':
+        return lambda: model.objects(id=values['id']).async_update(
+            c0='updated')
+    if name == 'delete':
+        instance = model(**values)
+        return instance.async_delete
+    if name == 'get':
+        return lambda: model.async_get(id=values['id'])
+    if name == 'batch':
+
+        async def batch():
+            b = AioBatchQuery()
+            for _ in range(BATCH_SIZE):
+                model.batch(b).create(**values)
+            await b.async_execute()
+
+        return batch
+    if name == 'iterate':
+
+        async def iterate():
+            count = 0
+            async for _ in model.objects.fetch_size(page_size).async_iterate():
+                count += 1
+            return count
+
+        return iterate
+    raise ValueError(name)
+
+
+def run_sync(operation, ops, concurrency):
+    latencies = []
+    remaining = iter(range(ops))
+
+    def worker():
+        for _ in remaining:
+            start = perf_counter()
+            operation()
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return perf_counter() - start, latencies
+
+
+def run_async(loop, operation, ops, concurrency):
+    latencies = []
+    remaining = iter(range(ops))
+
+    async def worker():
+        for _ in remaining:
+            start = perf_counter()
+            await operation()
+            latencies.append(perf_counter() - start)
+
+    async def run():
+        start = perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return perf_counter() - start
+
+    return loop.run_until_complete(run()), latencies
+
+
+def measure(run, operation, ops, concurrency):
+    # warm up, then time, then measure the allocations on fewer ops as
+    # tracemalloc slows everything down
+    run(operation, min(ops, 100), concurrency)
+    elapsed, latencies = run(operation, ops, concurrency)
+    tracemalloc.start()
+    run(operation, max(1, ops // 10), concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        'ops_per_s': ops / elapsed,
+        'p50_ms': latencies[int(len(latencies) * 0.5)] * 1e3,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1e3,
+        'peak_kib': peak / 1024,
+    }
+
+
+def scenarios(args):
+    for name, concurrency, width in product(args.operations,
+                                            args.concurrency, args.width):
+        for page_size in (args.page_size if name == 'iterate' else [None]):
+            yield name, concurrency, width, page_size
+
+
+def scenario_key(name, concurrency, width, page_size):
+    key = '{0} c={1} w={2}'.format(name, concurrency, width)
+    if page_size is not None:
+        key += ' p={0}'.format(page_size)
+    return key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--operations', nargs='+', default=OPERATIONS,
+                        choices=OPERATIONS)
+    parser.add_argument('--ops', type=int, default=2000,
+                        help='operations per scenario, a full scan of '
+                        'the table counting as 100')
+    parser.add_argument('--concurrency', nargs='+', type=int,
+                        default=[1, 32])
+    parser.add_argument('--width', nargs='+', type=int, default=[4, 32],
+                        help='text columns per row')
+    parser.add_argument('--page-size', nargs='+', type=int,
+                        default=[100, 1000], help='fetch size of iterate')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed drop of the async/sync ratio')
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    session = FakeSession(table_rows=TABLE_ROWS)
+    register(session)
+    aiosession_for_cqlengine(session, loop=loop)
+
+    results = {}
+    print('{0:<28} {1:>10} {2:>10} {3:>8} {4:>8} {5:>10} {6:>6}'.format(
+        'scenario', 'mode', 'ops/s', 'p50 ms', 'p99 ms', 'peak KiB',
+        'ratio'))
+    for name, concurrency, width, page_size in scenarios(args):
+        sync_model, async_model = build_models(width)
+        values = row_values(width)
+        session.row = values
+        ops = args.ops // 100 if name == 'iterate' else args.ops
+        key = scenario_key(name, concurrency, width, page_size)
+        result = results[key] = {
+            'sync': measure(run_sync,
+                            sync_operation(name, sync_model, values,
+                                           page_size), ops, concurrency),
+            'async': measure(partial(run_async, loop),
+                             async_operation(name, async_model, values,
+                                             page_size), ops, concurrency),
+        }
+        result['ratio'] = (result['async']['ops_per_s'] /
+                           result['sync']['ops_per_s'])
+        for mode in ('sync', 'async'):
+            print('{0:<28} {1:>10} {ops_per_s:>10.0f} {p50_ms:>8.3f} '
+                  '{p99_ms:>8.3f} {peak_kib:>10.1f} {2:>6}'.format(
+                      key, mode,
+                      '{0:.2f}'.format(result['ratio'])
+                      if mode == 'async' else '', **result[mode]))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [
+            (key, baseline[key]['ratio'], result['ratio'])
+            for key, result in results.items() if key in baseline
+            and result['ratio'] < baseline[key]['ratio'] *
+            (1 - args.tolerance)
+        ]
+        for key, before, after in regressions:
+            print('Regression: {0}, async/sync ratio {1:.2f} -> {2:.2f}'.
+                  format(key, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,31 @@
+import asyncio
+import contextlib
+import os
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
-from cassandra.cqlengine import columns
+from cassandra import OperationTimedOut
+from cassandra.cluster import Cluster
+from cassandra.cqlengine import columns, ValidationError
+from cassandra.cqlengine.query import BatchQuery, LWTException
 
+from aiocqlengine.cache import ModelCache
+from aiocqlengine.counters import IncrementCoalescer
+from aiocqlengine.hedging import Hedging
+from aiocqlengine.metrics import MetricsRegistry
 from aiocqlengine.models import AioModel
-from aiocqlengine.query import AioBatchQuery
+from aiocqlengine.query import AioBatchQuery, _compiled_statements, execute
+from aiocqlengine.rows import CompactRow
+from aiocqlengine.scheduler import RequestScheduler
+from aiocqlengine.session import (
+    PreparedStatementCache,
+    RoutingStats,
+    aiosession_for_cqlengine,
+    connect_aiosession,
+)
+from aiocqlengine.writebehind import WriteBehindBuffer
 
 
 class User(AioModel):
@@ -12,6 +33,32 @@ class User(AioModel):
     username = columns.Text()
 
 
+class CachedUser(AioModel):
+    __cache__ = ModelCache(ttl=30)
+    user_id = columns.UUID(primary_key=True)
+    username = columns.Text()
+
+
+class PageViews(AioModel):
+    __counter_coalescer__ = IncrementCoalescer(window=0.01)
+    page_id = columns.UUID(primary_key=True)
+    views = columns.Counter()
+    likes = columns.Counter()
+
+
+class Event(AioModel):
+    user_id = columns.UUID(primary_key=True)
+    at = columns.DateTime(primary_key=True)
+    name = columns.Text()
+
+
+class Presence(AioModel):
+    __write_behind__ = WriteBehindBuffer(interval=60)
+    user_id = columns.UUID(primary_key=True)
+    status = columns.Text()
+    seen = columns.Integer()
+
+
 @pytest.mark.asyncio
 async def test_queryset_async_functions(cqlengine_management):
     """test cqlengine Model async functions:
@@ -118,3 +165,659 @@ async def test_async_iterate(cqlengine_management):
         result_count_2 += len(users)
     assert iter_count_2 == 8
     assert result_count_2 == 80
+
+
+@pytest.mark.asyncio
+async def test_prepared_statement_cache(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    cache = PreparedStatementCache(cassandra, maxsize=8)
+    cassandra.prepared_statement_cache = cache
+    try:
+        for i in range(3):
+            await User.async_create(user_id=uuid.uuid4(), username=f'{i}')
+        assert cache.misses == 1
+        assert cache.hits == 2
+
+        users = await User.async_all()
+        assert {user.username for user in users} == {"0", "1", "2"}
+        user = await User.async_get(user_id=users[0].user_id)
+        assert user.username == users[0].username
+
+        size = len(cache)
+        cache.invalidate(table="use")
+        assert len(cache) == size > 0
+        cache.invalidate(table=User.column_family_name())
+        assert len(cache) == 0
+    finally:
+        cassandra.prepared_statement_cache = None
+
+
+@pytest.mark.asyncio
+async def test_async_bulk_create(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    rows = [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(50)]
+    rows.append(User(user_id=uuid.uuid4(), username="instance"))
+    rows.append({"user_id": uuid.uuid4(), "nickname": "bad-row"})
+
+    with pytest.raises(ValueError):
+        await User.async_bulk_create(rows, concurrency=0)
+    results = await User.async_bulk_create(rows, concurrency=8)
+    assert len(results) == 52
+    assert all(isinstance(result, User) for result in results[:51])
+    assert isinstance(results[51], ValidationError)
+
+    users = await User.async_all()
+    assert len(users) == 51
+
+    existing = {"user_id": results[0].user_id, "username": "overwritten"}
+    results = await User.objects.if_not_exists().async_bulk_create([existing])
+    assert isinstance(results[0], LWTException)
+    user = await User.async_get(user_id=existing["user_id"])
+    assert user.username == "0"
+
+
+@pytest.mark.asyncio
+async def test_request_scheduler(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    scheduler = RequestScheduler(max_in_flight=4,
+                                 max_in_flight_per_host=2,
+                                 prioritize_reads=True)
+    cassandra.request_scheduler = scheduler
+    try:
+        await asyncio.gather(*[
+            User.async_create(user_id=uuid.uuid4(), username=f"{i}")
+            for i in range(40)
+        ])
+        assert scheduler.in_flight == 0
+        assert scheduler.queue_depth == 0
+        assert not scheduler._replicas_in_flight
+        assert 0 < scheduler.max_queue_depth <= 36
+        assert len(await User.async_all()) == 40
+    finally:
+        cassandra.request_scheduler = None
+
+
+@pytest.mark.asyncio
+async def test_queryset_async_for(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    await User.async_bulk_create(
+        [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(101)])
+
+    for depth in (0, 1, 3):
+        usernames = set()
+        async for user in User.objects.all().fetch_size(10).prefetch(depth):
+            usernames.add(user.username)
+        assert usernames == {f"{i}" for i in range(101)}
+
+    users = await User.objects.all().fetch_size(10).async_all()
+    assert len(users) == 101
+
+
+@pytest.mark.asyncio
+async def test_queryset_async_iterate_resume(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    await User.async_bulk_create(
+        [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(45)])
+    queryset = User.objects.all().limit(None).fetch_size(10)
+
+    pages = []
+    async for page in queryset.async_iterate(pages=True):
+        pages.append(page)
+        if len(pages) == 2:
+            break
+    resume_token = pages[-1].resume_token
+    assert isinstance(resume_token, str)
+
+    rest = [
+        user.username
+        async for user in queryset.async_iterate(resume_token=resume_token)
+    ]
+    seen = [user.username for page in pages for user in page]
+    assert len(seen) + len(rest) == 45
+    assert set(seen) | set(rest) == {f"{i}" for i in range(45)}
+
+
+@pytest.mark.asyncio
+async def test_parallel_scan(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    await User.async_bulk_create(
+        [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(120)])
+
+    scan = User.objects.fetch_size(10).parallel_scan(splits=16,
+                                                    concurrency=4)
+    usernames = []
+    async for user in scan:
+        usernames.append(user.username)
+        if len(usernames) == 50:
+            break
+    checkpoint = scan.checkpoint()
+    assert len(checkpoint) == 16
+
+    resumed = User.objects.fetch_size(10).parallel_scan(checkpoint=checkpoint,
+                                                       pages=True)
+    async for page in resumed:
+        usernames.extend(user.username for user in page)
+    assert resumed.done
+    assert set(usernames) == {f"{i}" for i in range(120)}
+
+
+@pytest.mark.asyncio
+async def test_queryset_raw_rows(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    user_id = uuid.uuid4()
+    await User.async_create(user_id=user_id, username="raw")
+
+    rows = [row async for row in User.objects.as_dicts()]
+    assert rows == [{"user_id": user_id, "username": "raw"}]
+
+    rows = [row async for row in User.objects.as_tuples()]
+    assert rows[0].user_id == user_id
+    assert rows[0].username == "raw"
+
+    rows = await User.objects.filter(user_id=user_id).as_tuples().async_all()
+    assert rows[0] == (user_id, "raw")
+
+
+@pytest.mark.asyncio
+async def test_batch_query_split(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    batch_query = AioBatchQuery(batch_type="UNLOGGED",
+                                group_by_partition=True,
+                                max_statements=5)
+    for i in range(23):
+        User.batch(batch_query).create(user_id=uuid.uuid4(), username=f"{i}")
+    batches = await batch_query._batch_statements(batch_query.queries)
+    assert len(batches) == 23
+    await batch_query.async_execute()
+
+    users = await User.async_all()
+    assert {user.username for user in users} == {f"{i}" for i in range(23)}
+
+    # batches with a timestamp are split as well, sent as CQL
+    batch_query = AioBatchQuery(max_statements=5, timestamp=datetime.now())
+    for i in range(12):
+        User.batch(batch_query).create(user_id=uuid.uuid4(), username="ts")
+    sent = []
+    execute_cql = batch_query._async_execute_cql
+
+    async def _execute_cql(queries):
+        sent.append(len(queries))
+        await execute_cql(queries)
+
+    batch_query._async_execute_cql = _execute_cql
+    await batch_query.async_execute()
+    assert sorted(sent) == [2, 5, 5]
+    users = await User.async_all()
+    assert sum(user.username == "ts" for user in users) == 12
+
+
+@pytest.mark.asyncio
+async def test_batch_query_async_with(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    async with AioBatchQuery(flush_every=10) as batch_query:
+        for i in range(35):
+            User.batch(batch_query).create(user_id=uuid.uuid4(),
+                                           username=f"{i}")
+        assert len(batch_query.queries) < 10
+
+    users = await User.async_all()
+    assert {user.username for user in users} == {f"{i}" for i in range(35)}
+
+    with pytest.raises(ValueError):
+        async with AioBatchQuery() as batch_query:
+            User.batch(batch_query).create(user_id=uuid.uuid4(),
+                                           username="not-saved")
+            raise ValueError
+    assert len(await User.async_all()) == 35
+
+
+@pytest.mark.asyncio
+async def test_compiled_statements(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    _compiled_statements.clear()
+    users = [
+        await User.async_create(user_id=uuid.uuid4(), username=f"{i}")
+        for i in range(3)
+    ]
+    for user in users:
+        await user.async_update(username=user.username + "-updated")
+    await users[0].async_delete()
+
+    operations = sorted(key[1] for key in _compiled_statements)
+    assert operations == ["delete", "insert", "update"]
+    usernames = {user.username for user in await User.async_all()}
+    assert usernames == {"1-updated", "2-updated"}
+
+
+@pytest.mark.asyncio
+async def test_connect_aiosession(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    cluster = Cluster([os.getenv("CASSANDRA_HOST", "127.0.0.1")])
+    session = await connect_aiosession(cluster, "test_async_cqlengine")
+    loop = asyncio.get_event_loop()
+    try:
+        user_id = uuid.uuid4()
+        await session.execute_future(
+            "INSERT INTO user (user_id, username) VALUES (%s, %s)",
+            (user_id, "loop-user"))
+        rows = await session.execute_future(
+            "SELECT username FROM user WHERE user_id = %s", (user_id, ))
+        assert rows.one().username == "loop-user"
+
+        with pytest.raises(RuntimeError):
+            await connect_aiosession(cluster)
+    finally:
+        await loop.run_in_executor(None, cluster.shutdown)
+
+
+@pytest.mark.asyncio
+async def test_coalesced_result_delivery(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    aiosession_for_cqlengine(cassandra,
+                             loop=cassandra._asyncio_loop,
+                             coalesce_results=True)
+
+    await asyncio.gather(*[
+        User.async_create(user_id=uuid.uuid4(), username="user")
+        for _ in range(100)
+    ])
+    assert len(await User.async_all()) == 100
+
+    delivery = cassandra.result_delivery
+    assert delivery.delivered == 101
+    assert 0 < delivery.wakeups <= delivery.delivered
+
+
+@pytest.mark.asyncio
+async def test_model_cache(cqlengine_management):
+    cqlengine_management.sync_table(CachedUser)
+    cache = CachedUser.__cache__
+    user = await CachedUser.async_create(user_id=uuid.uuid4(), username="a")
+
+    users = await asyncio.gather(
+        *[CachedUser.async_get(user_id=user.user_id) for _ in range(10)])
+    assert {u.username for u in users} == {"a"}
+    assert cache.misses == 1
+    assert cache.hits + cache.coalesced == 9
+
+    first = await CachedUser.objects.filter(user_id=user.user_id).async_first()
+    assert first.username == "a"
+    assert cache.misses == 1
+
+    # writes through the model invalidate the cached row
+    user.username = "b"
+    await user.async_save()
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "b"
+    await CachedUser.objects(user_id=user.user_id).async_update(username="c")
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "c"
+    assert cache.misses == 3
+
+    # so do batches executed synchronously, outside of the loop
+    def _sync_batch():
+        with BatchQuery() as b:
+            CachedUser.batch(b).create(user_id=user.user_id, username="d")
+
+    await asyncio.get_event_loop().run_in_executor(None, _sync_batch)
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "d"
+
+    # and async batches, before they return
+    b = AioBatchQuery()
+    await CachedUser.objects(user_id=user.user_id).batch(b).async_update(
+        username="e")
+    await b.async_execute()
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "e"
+    async with AioBatchQuery() as b:
+        user.username = "f"
+        await user.batch(b).async_save()
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "f"
+    await CachedUser.async_bulk_create([{
+        "user_id": user.user_id,
+        "username": "g"
+    }])
+    assert (await CachedUser.async_get(user_id=user.user_id)).username == "g"
+
+    await user.async_delete()
+    with pytest.raises(CachedUser.DoesNotExist):
+        await CachedUser.async_get(user_id=user.user_id)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_reads(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    aiosession_for_cqlengine(cassandra,
+                             loop=cassandra._asyncio_loop,
+                             single_flight_reads=True)
+    user = await User.async_create(user_id=uuid.uuid4(), username="user")
+
+    users = await asyncio.gather(
+        *[User.async_get(user_id=user.user_id) for _ in range(20)])
+    assert {u.username for u in users} == {"user"}
+
+    single_flight = cassandra.single_flight
+    assert single_flight.requests == 20
+    assert 0 < single_flight.collapsed < 20
+    assert len(single_flight) == 0
+
+    # IN queries share a request as well
+    collapsed = single_flight.collapsed
+    await asyncio.gather(*[
+        User.objects.filter(user_id__in=[user.user_id]).async_all()
+        for _ in range(10)
+    ])
+    assert single_flight.collapsed > collapsed
+
+
+@pytest.mark.asyncio
+async def test_async_get_many(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    users = await User.async_bulk_create(
+        [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(50)])
+    missing = [uuid.uuid4() for _ in range(5)]
+
+    found = await User.async_get_many(
+        [u.user_id for u in users[:30]] + missing, concurrency=4)
+    assert set(found) == {u.user_id for u in users[:30]}
+    assert all(found[u.user_id].username == u.username for u in users[:30])
+
+    keys = [u.user_id for u in users[:3]]
+    rows = await User.objects.as_dicts().async_get_many(keys)
+    assert set(rows) == set(keys)
+    rows = await User.objects.as_tuples().async_get_many(keys)
+    assert set(rows) == set(keys)
+
+    # stored timestamps lose their microseconds and time zone
+    cqlengine_management.sync_table(Event)
+    user_id = users[0].user_id
+    at = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    zoned = datetime(2024, 1, 1, 14, 0, tzinfo=timezone(timedelta(hours=2)))
+    await Event.async_create(user_id=user_id, at=at, name="login")
+    await Event.async_create(user_id=user_id, at=zoned, name="logout")
+    found = await Event.async_get_many([(user_id, at), (user_id, zoned)])
+    assert found[user_id, at].name == "login"
+    assert found[user_id, zoned].name == "logout"
+
+
+@pytest.mark.asyncio
+async def test_async_count_exists(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    assert await User.objects.async_count() == 0
+    assert not await User.objects.async_exists()
+
+    users = await User.async_bulk_create(
+        [{"user_id": uuid.uuid4(), "username": f"{i}"} for i in range(25)])
+    assert await User.objects.async_count() == 25
+    assert await User.objects.fetch_size(10).async_count(paged=True) == 25
+    assert await User.objects.distinct().async_count() == 25
+    assert await User.objects.filter(user_id=users[0].user_id).async_exists()
+    assert not await User.objects.filter(user_id=uuid.uuid4()).async_exists()
+
+
+@pytest.mark.asyncio
+async def test_hedged_reads(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    user = await User.async_create(user_id=uuid.uuid4(), username="user")
+
+    # without a delay every read is hedged right away
+    hedging = Hedging(delay=0, max_extra_attempts=1)
+    queryset = User.objects.hedge(hedging)
+    for _ in range(5):
+        found = await queryset.async_get(user_id=user.user_id)
+        assert found.username == "user"
+    assert hedging.requests == 5
+    assert hedging.fired == 5
+    assert 0 <= hedging.won <= 5
+
+
+@pytest.mark.asyncio
+async def test_cancellation_and_deadline(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    query = "SELECT * FROM user"
+
+    task = asyncio.ensure_future(cassandra.execute_future(query))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    with pytest.raises(OperationTimedOut):
+        await cassandra.execute_future(query, deadline=time.monotonic() - 1)
+
+    rows = await cassandra.execute_future(query,
+                                          deadline=time.monotonic() + 10)
+    assert list(rows) == []
+
+
+async def _cancel_in_flight(session):
+    query = "SELECT * FROM user"
+    tasks = [
+        asyncio.ensure_future(session.execute_future(query))
+        for _ in range(50)
+    ]
+    await asyncio.sleep(0.001)
+    for task in tasks:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert any(isinstance(r, asyncio.CancelledError) for r in results)
+
+    # the late responses release the stream ids of the abandoned requests
+    for _ in range(100):
+        in_flight = sum(connection.in_flight
+                        for pool in session._pools.values()
+                        for connection in pool.get_connections())
+        if not in_flight:
+            break
+        await asyncio.sleep(0.01)
+    assert in_flight == 0
+
+    results = await asyncio.gather(
+        *[session.execute_future(query) for _ in range(50)])
+    assert all(list(rows) == [] for rows in results)
+
+
+@pytest.mark.asyncio
+async def test_cancel_in_flight(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    await _cancel_in_flight(cassandra)
+
+    cluster = Cluster([os.getenv("CASSANDRA_HOST", "127.0.0.1")])
+    session = await connect_aiosession(cluster, "test_async_cqlengine")
+    try:
+        await _cancel_in_flight(session)
+    finally:
+        await asyncio.get_event_loop().run_in_executor(None, cluster.shutdown)
+
+
+@pytest.mark.asyncio
+async def test_metrics(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    spans = []
+
+    @contextlib.contextmanager
+    def span(name, attributes=None):
+        spans.append(name)
+        yield
+
+    registry = MetricsRegistry(span=span)
+    cassandra.metrics = registry
+    try:
+        for i in range(3):
+            await User.async_create(user_id=uuid.uuid4(), username=f"{i}")
+        assert len(await User.async_all()) == 3
+    finally:
+        cassandra.metrics = None
+
+    inserts = registry.operations["User", "insert"]
+    assert inserts.requests == 3
+    assert inserts.latency.count == inserts.network.count == 3
+    selects = registry.operations["User", "select"]
+    assert selects.pages == 1
+    assert selects.rows == 3
+    assert spans == ["cassandra.insert"] * 3 + ["cassandra.select"]
+
+    text = registry.prometheus()
+    assert ('aiocqlengine_requests_total{model="User",operation="insert"} 3'
+            in text)
+    assert ('aiocqlengine_request_duration_seconds_count'
+            '{model="User",operation="select"} 1' in text)
+
+    # positional parameters are sized too
+    cassandra.metrics = registry
+    try:
+        rows = await execute("SELECT * FROM user WHERE user_id = %s",
+                             (uuid.uuid4(), ))
+    finally:
+        cassandra.metrics = None
+    assert list(rows) == []
+    assert registry.operations["", "select"].request_bytes > 0
+
+
+@pytest.mark.asyncio
+async def test_token_aware_routing(cqlengine_management, cassandra):
+    cqlengine_management.sync_table(User)
+    user_id = uuid.uuid4()
+    await User.async_create(user_id=user_id, username="user")
+
+    cassandra.routing = RoutingStats()
+    await User.objects.async_get(user_id=user_id)
+    await User.objects.filter(user_id__in=[user_id]).async_all()
+    assert cassandra.routing.token_aware == 2
+
+    # a single partition batch is routed, a multi-partition one is not
+    batch_query = AioBatchQuery()
+    User.batch(batch_query).create(user_id=user_id, username="user-1")
+    User.objects.batch(batch_query).filter(user_id=user_id).update(
+        username="user-2")
+    await batch_query.async_execute()
+    assert cassandra.routing.token_aware == 3
+
+    batch_query = AioBatchQuery()
+    User.batch(batch_query).create(user_id=uuid.uuid4(), username="user-3")
+    User.batch(batch_query).create(user_id=uuid.uuid4(), username="user-4")
+    await batch_query.async_execute()
+    await User.async_all()
+    assert cassandra.routing.requests == 5
+    assert cassandra.routing.token_aware_fraction == 3 / 5
+
+
+@pytest.mark.asyncio
+async def test_async_incr(cqlengine_management):
+    cqlengine_management.sync_table(PageViews)
+    page_id = uuid.uuid4()
+    coalescer = PageViews.__counter_coalescer__
+    writes = coalescer.writes
+
+    await asyncio.gather(*[
+        PageViews.async_incr(page_id=page_id, views=1) for _ in range(50)
+    ])
+    assert coalescer.writes == writes + 1
+    page = await PageViews.async_get(page_id=page_id)
+    assert page.views == 50
+
+    await PageViews.async_incr_many([{
+        "page_id": page_id,
+        "views": -10,
+        "likes": 2
+    }] * 2)
+    page = await PageViews.async_get(page_id=page_id)
+    assert (page.views, page.likes) == (30, 4)
+
+    with pytest.raises(ValidationError):
+        await PageViews.async_incr(views=1)
+
+
+@pytest.mark.asyncio
+async def test_write_behind(cqlengine_management):
+    cqlengine_management.sync_table(Presence)
+    buffer = Presence.__write_behind__
+    user_id = uuid.uuid4()
+
+    for i in range(10):
+        await Presence.objects(user_id=user_id).async_update(seen=i)
+    await Presence.objects(user_id=user_id).async_update(status="online")
+    assert len(buffer) == 1
+    assert buffer.coalesced == 10
+    assert await Presence.objects(user_id=user_id).async_first() is None
+
+    await buffer.flush()
+    assert buffer.flushed == 1
+    presence = await Presence.async_get(user_id=user_id)
+    assert (presence.status, presence.seen) == ("online", 9)
+
+    # bulk inserts too, the buffered update can't overwrite them later
+    await Presence.objects(user_id=user_id).async_update(status="busy")
+    await Presence.async_bulk_create([{"user_id": user_id, "status": "bulk"}])
+    assert len(buffer) == 0
+    await buffer.flush()
+    assert (await Presence.async_get(user_id=user_id)).status == "bulk"
+
+    # other writes of the row send its pending update first
+    await presence.async_update(status="away")
+    await presence.async_delete()
+    assert len(buffer) == 0
+    assert await Presence.objects(user_id=user_id).async_first() is None
+
+
+def test_write_behind_concurrency():
+    with pytest.raises(ValueError):
+        WriteBehindBuffer(concurrency=0)
+
+
+@pytest.mark.asyncio
+async def test_write_behind_order():
+    buffer = WriteBehindBuffer(interval=60)
+    sent = []
+
+    def writer(delay):
+        async def write(values):
+            await asyncio.sleep(delay)
+            sent.append(values["seen"])
+
+        return write
+
+    await buffer.add("hot", {"seen": 1}, writer(0.05))
+    flush = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0.01)
+    # flushed while the older value is still being written
+    await buffer.add("hot", {"seen": 2}, writer(0))
+    await buffer.flush()
+    await flush
+    assert sent == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_lazy_hydration(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    user_id = uuid.uuid4()
+    await User.async_create(user_id=user_id, username="user")
+
+    user = (await User.objects.lazy().filter(user_id=user_id).async_all())[0]
+    assert dict.__len__(user._values) == 0
+    assert user.username == "user"
+    assert dict.__len__(user._values) == 1
+    assert user == await User.async_get(user_id=user_id)
+
+    user.username = "updated"
+    await user.async_save()
+    assert (await User.async_get(user_id=user_id)).username == "updated"
+
+
+@pytest.mark.asyncio
+async def test_compact_rows(cqlengine_management):
+    cqlengine_management.sync_table(User)
+    user_id = uuid.uuid4()
+    await User.async_create(user_id=user_id, username="user")
+
+    rows = await User.objects.compact().async_all()
+    assert len(rows) == 1
+    row = rows[0]
+    assert isinstance(row, CompactRow)
+    assert not hasattr(row, "__dict__")
+    assert (row.user_id, row["username"]) == (user_id, "user")
+    with pytest.raises(AttributeError):
+        row.username = "updated"
+
+    user = row.to_model()
+    user.username = "updated"
+    await user.async_save()
+    async for row in User.objects.filter(user_id=user_id).compact():
+        assert row.username == "updated"